@@ -0,0 +1,296 @@
+"""End-to-end forwarding: throughput, forward latency and peak memory under a synthetic update mix.
+
+    python bench/bench_forward.py [--updates 1000] [--chats 20] [--concurrency 32] [--mode queue|inline]
+                                  [--mix text=0.6,photo=0.2,voice=0.15,video=0.05] [--api-latency 0.05]
+                                  [--flood-rate 0.0] [--other-rate 0.0] [--secret TOKEN]
+                                  [--warmup blocking|background|off] [--send-limits] [--seed 0]
+
+Starts the fake Bot API (bench/fake_bot_api.py) in this process and
+`python main.py` against it as a child process, with --chats source
+chats -1001, -1002, ... each routed to the chat 100 below it (-1101,
+-1102, ...). Once /ready answers, the generated updates
+(bench/updates.py) are POSTed to the webhook with --concurrency requests
+in flight, and the run waits until the bot is idle. Telegram's send
+pacing is lifted unless --send-limits is given. Forward latency is the
+time from POSTing an update to the fake API receiving its copyMessage.
+Peak RSS is the bot's VmHWM plus the largest total seen across it and
+its media workers; CPU is the bot process's user+system time per 1000
+updates, from the first POST until it last had work (media workers
+excluded, so it tracks the event loop).
+Prints JSON tagged with the current commit, so runs can be compared.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import ClientError, ClientSession
+
+from fake_bot_api import FakeBotAPI, free_port
+from updates import DEFAULT_MIX, UpdateGenerator
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        kind, weight = part.split("=")
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+# --- Memory (Linux /proc) ---
+def _status_kb(pid: int, field: str) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def cpu_seconds(pid: int) -> float:
+    """User + system CPU time of one process."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return 0.0
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _process_tree(pid: int) -> List[int]:
+    pids, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        pids.append(current)
+        try:
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    stack.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+class RssSampler:
+    """Polls the bot's process tree and keeps the peak total RSS."""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak_tree_kb = 0
+        self.peak_main_kb = 0
+
+    def sample(self) -> None:
+        self.peak_tree_kb = max(self.peak_tree_kb, sum(_status_kb(p, "VmRSS") for p in _process_tree(self.pid)))
+        self.peak_main_kb = max(self.peak_main_kb, _status_kb(self.pid, "VmHWM"))
+
+    async def run(self) -> None:
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+
+def bot_env(api_port: int, bot_port: int, chats: List[int], args, db_dir: str) -> dict:
+    env = dict(
+        os.environ,
+        BOT_TOKEN="123:bench",
+        ADMIN_CHAT_IDS="1",
+        PORT=str(bot_port),
+        TELEGRAM_API_BASE_URL=f"http://127.0.0.1:{api_port}",
+        ROUTES_DB=os.path.join(db_dir, "routes.db"),
+        RESULT_CACHE_DB=os.path.join(db_dir, "results.db"),
+        FORWARD_LOG_DB=os.path.join(db_dir, "forward_log.db"),
+        ROUTES_MAP=",".join(f"{chat}:{chat - 100}" for chat in chats),
+        WEBHOOK_MODE=args.mode,
+        MEDIA_WARMUP=args.warmup,
+        WEBHOOK_SECRET=args.secret,
+    )
+    if not args.send_limits:
+        # Telegram's pacing (20 messages a minute per group) would dominate every number
+        env.update(SEND_GLOBAL_RATE="100000", SEND_GLOBAL_BURST="100000", SEND_CHAT_RATE="6000000", SEND_CHAT_BURST="100000")
+    return env
+
+
+async def wait_ready(session: ClientSession, url: str, proc: subprocess.Popen, timeout: float) -> float:
+    started = time.perf_counter()
+    while proc.poll() is None and time.perf_counter() - started < timeout:
+        try:
+            async with session.get(f"{url}/ready") as resp:
+                if resp.status == 200:
+                    return time.perf_counter() - started
+        except ClientError:
+            pass
+        await asyncio.sleep(0.05)
+    raise RuntimeError("bot did not become ready")
+
+
+def backlog(stats: dict) -> int:
+    """Updates and sends the bot still has queued, from its /stats."""
+    queued = stats.get("update_queue", {}).get("depth", 0)
+    queued += sum(target["depth"] for target in stats.get("send_scheduler", {}).get("targets", {}).values())
+    transcriber = stats.get("media", {}).get("transcriber", {})
+    return queued + transcriber.get("pending", 0) + transcriber.get("in_flight", 0)
+
+
+async def drain(session: ClientSession, url: str, api: FakeBotAPI, pid: int, quiet: float, timeout: float):
+    """Wait until the bot has nothing queued and no call has reached the fake API for `quiet` seconds.
+
+    Returns the bot's last /stats and its CPU time when it last had work,
+    so the idle wait and the /stats polling are left out.
+    """
+    started = time.perf_counter()
+    seen, last_change, cpu = len(api.calls), time.perf_counter(), cpu_seconds(pid)
+    while True:
+        await asyncio.sleep(0.1)
+        busy_cpu = cpu_seconds(pid)
+        async with session.get(url + "/stats") as resp:
+            stats = await resp.json()
+        if len(api.calls) != seen or backlog(stats):
+            seen, last_change, cpu = len(api.calls), time.perf_counter(), busy_cpu
+        elif time.perf_counter() - last_change >= quiet or time.perf_counter() - started >= timeout:
+            return stats, cpu
+
+
+async def run(args) -> dict:
+    chats = [-1000 - i for i in range(1, args.chats + 1)]
+    generator = UpdateGenerator(chats, mix=args.mix, other_rate=args.other_rate, seed=args.seed)
+    updates = generator.take(args.updates)
+    api = FakeBotAPI(
+        latency=args.api_latency, jitter=args.api_latency / 2, flood_rate=args.flood_rate,
+        files=generator.files(), seed=args.seed,
+    )
+    api_port = await api.start()
+    bot_port = free_port()
+    url = f"http://127.0.0.1:{bot_port}"
+    posted_at: Dict[tuple, float] = {}
+    statuses: Dict[int, int] = {}
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        proc = subprocess.Popen(
+            [sys.executable, "main.py"], cwd=ROOT, env=bot_env(api_port, bot_port, chats, args, db_dir),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL if not args.verbose else None,
+        )
+        sampler = RssSampler(proc.pid)
+        sampling = asyncio.ensure_future(sampler.run())
+        try:
+            async with ClientSession() as session:
+                ready_s = await wait_ready(session, url, proc, args.ready_timeout)
+                pending = asyncio.Semaphore(args.concurrency)
+                headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret} if args.secret else {}
+
+                async def post(update: dict) -> None:
+                    message = update.get("message")
+                    async with pending:
+                        if message:
+                            posted_at[(message["chat"]["id"], message["message_id"])] = time.perf_counter()
+                        async with session.post(url + "/", json=update, headers=headers) as resp:
+                            statuses[resp.status] = statuses.get(resp.status, 0) + 1
+
+                cpu_started = cpu_seconds(proc.pid)
+                started = time.perf_counter()
+                await asyncio.gather(*(post(update) for update in updates))
+                posted_s = time.perf_counter() - started
+                bot_stats, cpu_finished = await drain(session, url, api, proc.pid, args.quiet, args.drain_timeout)
+                cpu_used = cpu_finished - cpu_started
+                finished = api.sends()[-1].at if api.sends() else time.perf_counter()
+        finally:
+            sampling.cancel()
+            sampler.sample()
+            proc.terminate()
+            proc.wait()
+            await api.stop()
+
+    # First copy of each source message; forwards to several targets count once
+    latencies = {}
+    for call in api.sends():
+        if call.method != "copyMessage":
+            continue
+        key = (int(call.params.get("from_chat_id", 0)), int(call.params.get("message_id", 0)))
+        if key in posted_at and key not in latencies:
+            latencies[key] = (call.at - posted_at[key]) * 1000
+    values = list(latencies.values())
+    elapsed = max(finished - started, posted_s)
+    return {
+        "commit": commit(),
+        "config": {
+            "updates": args.updates, "chats": args.chats, "concurrency": args.concurrency, "mode": args.mode,
+            "mix": args.mix, "other_rate": args.other_rate, "api_latency_s": args.api_latency,
+            "flood_rate": args.flood_rate, "secret": bool(args.secret),
+            "warmup": args.warmup, "send_limits": args.send_limits, "seed": args.seed,
+        },
+        "generated": generator.kinds,
+        "ready_s": round(ready_s, 3),
+        "webhook_statuses": statuses,
+        "post_seconds": round(posted_s, 3),
+        "seconds": round(elapsed, 3),
+        "updates_per_s": round(args.updates / elapsed, 1),
+        "cpu_ms_per_1k_updates": round(cpu_used * 1000 * 1000 / args.updates, 1),
+        "forwarded": len(values),
+        "sends": len(api.sends()),
+        "floods_injected": api.floods,
+        "forward_latency_ms": {
+            "p50": round(percentile(values, 50), 1) if values else None,
+            "p95": round(percentile(values, 95), 1) if values else None,
+            "p99": round(percentile(values, 99), 1) if values else None,
+            "max": round(max(values), 1) if values else None,
+            "mean": round(statistics.mean(values), 1) if values else None,
+        },
+        "peak_rss_mb": {
+            "bot": round(sampler.peak_main_kb / 1024, 1),
+            "bot_and_workers": round(sampler.peak_tree_kb / 1024, 1),
+        },
+        "bot_media": bot_stats.get("media", {}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mode", default="queue", choices=["queue", "inline"])
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX)
+    parser.add_argument("--api-latency", type=float, default=0.05, help="fake Bot API response time (s)")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="share of sends answered with 429")
+    parser.add_argument("--other-rate", type=float, default=0.0, help="share of updates of a type no handler uses")
+    parser.add_argument("--secret", default="", help="WEBHOOK_SECRET for the bot, sent with every POST")
+    parser.add_argument("--warmup", default="blocking", choices=["background", "blocking", "off"])
+    parser.add_argument("--send-limits", action="store_true", help="keep the bot's Telegram send pacing")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    parser.add_argument("--quiet", type=float, default=1, help="idle seconds that end the run")
+    parser.add_argument("--drain-timeout", type=float, default=600)
+    parser.add_argument("--verbose", action="store_true", help="show the bot's log")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
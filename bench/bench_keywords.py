@@ -0,0 +1,110 @@
+"""Keyword engine vs. the old per-call keyword helpers.
+
+    python bench/bench_keywords.py [--messages 100000] [--seed 7]
+
+Builds a synthetic corpus of real-length group messages (mostly ordinary
+words, a few percent keywords, mixed case and punctuation), checks that
+both implementations agree on every message, and prints timings as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from keywords import DEFAULT_KEYWORDS, KeywordEngine, homework_score  # noqa: E402
+
+
+# --- The code being replaced (utils.is_junk_message / is_homework_text, backup/utils.is_homework) ---
+def legacy_is_junk_message(text):
+    if not text:
+        return False
+    junk_keywords = ["/nayavpn", "promo", "cheap price", "@", "join fast", "discount"]
+    return any(junk in text.lower() for junk in junk_keywords)
+
+
+def legacy_is_homework_text(text):
+    keywords = ["homework", "classwork", "assignment", "exercise", "page", "question", "write", "draw"]
+    return any(word in text.lower() for word in keywords)
+
+
+def legacy_homework_score(text):
+    text = text.lower()
+    strong_keywords = [
+        "homework", "assignment", "worksheet", "submit",
+        "classwork", "question", "due", "test", "exam",
+        "page", "chapter", "topic", "notes", "activity", "class test",
+    ]
+    weak_keywords = [
+        "work", "read", "write", "draw", "solve", "fill",
+        "copy", "prepare", "practice", "home task",
+    ]
+    strong_hits = sum(1 for word in strong_keywords if word in text)
+    weak_hits = sum(1 for word in weak_keywords if word in text)
+    hints = ["page", "submit", "due", "q.", "ex.", "exercise", "copy this"]
+    pattern_hits = sum(1 for h in hints if h in text)
+    return strong_hits * 2 + weak_hits + pattern_hits
+
+
+def legacy(text):
+    return legacy_is_junk_message(text), legacy_is_homework_text(text), legacy_homework_score(text)
+
+
+def build_corpus(count, seed):
+    rng = random.Random(seed)
+    vocab = ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 9))) for _ in range(5000)]
+    keywords = sorted({kw for kws in DEFAULT_KEYWORDS.values() for kw in kws})
+
+    def word():
+        if rng.random() < 0.04:
+            w = rng.choice(keywords)
+        else:
+            w = rng.choice(vocab)
+        if rng.random() < 0.1:
+            w = w.capitalize()
+        if rng.random() < 0.08:
+            w += rng.choice(".,!?:")
+        return w
+
+    return [" ".join(word() for _ in range(rng.randint(3, 80))) for _ in range(count)]
+
+
+def timed(func, corpus):
+    start = time.perf_counter()
+    for text in corpus:
+        func(text)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.messages, args.seed)
+    engine = KeywordEngine(DEFAULT_KEYWORDS)
+
+    def single_pass(text):
+        counts = engine.scan(text)
+        return counts["junk"] > 0, counts["homework"] > 0, homework_score(counts)
+
+    mismatches = sum(1 for text in corpus if legacy(text) != single_pass(text))
+    legacy_s = timed(legacy, corpus)
+    engine_s = timed(single_pass, corpus)
+    print(json.dumps({
+        "messages": len(corpus),
+        "avg_chars": round(sum(map(len, corpus)) / len(corpus), 1),
+        "mismatches": mismatches,
+        "legacy_us_per_msg": round(legacy_s / len(corpus) * 1e6, 2),
+        "engine_us_per_msg": round(engine_s / len(corpus) * 1e6, 2),
+        "speedup": round(legacy_s / engine_s, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""OCR on raw photos vs. the media/ocr.py preprocessing pipeline.
+
+    python bench/bench_ocr.py samples/ [--limit 50]
+
+Reads every .jpg/.jpeg/.png in the folder. If a .txt with the same name
+sits next to an image, it is the ground truth for character accuracy
+(1 - edit distance / reference length, whitespace collapsed). Prints
+ms/image for both paths, the preprocessing share, and the language the
+script detection picked, as JSON. Needs tesseract with the OCR_LANG packs.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytesseract  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from media import ocr  # noqa: E402
+from media.config import OCR_LANG  # noqa: E402
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def normalise(text: str) -> str:
+    return " ".join(text.split())
+
+
+def edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def char_accuracy(hypothesis: str, reference: str) -> float:
+    reference, hypothesis = normalise(reference), normalise(hypothesis)
+    if not reference:
+        return 1.0 if not hypothesis else 0.0
+    return max(0.0, 1 - edit_distance(hypothesis, reference) / len(reference))
+
+
+def run_raw(path: str):
+    start = time.perf_counter()
+    text = pytesseract.image_to_string(Image.open(path), lang=OCR_LANG)
+    return text, (time.perf_counter() - start) * 1000, 0.0, OCR_LANG
+
+
+def run_pipeline(path: str):
+    start = time.perf_counter()
+    prepared = ocr.preprocess(Image.open(path))
+    prep_ms = (time.perf_counter() - start) * 1000
+    text = pytesseract.image_to_string(prepared.image, lang=prepared.lang)
+    return text, (time.perf_counter() - start) * 1000, prep_ms, prepared.lang
+
+
+def summarise(rows: list) -> dict:
+    scored = [r["accuracy"] for r in rows if r["accuracy"] is not None]
+    return {
+        "ms_per_image": round(statistics.mean(r["ms"] for r in rows), 1),
+        "p95_ms": round(sorted(r["ms"] for r in rows)[int(0.95 * (len(rows) - 1))], 1),
+        "preprocess_ms": round(statistics.mean(r["prep_ms"] for r in rows), 1),
+        "char_accuracy": round(statistics.mean(scored), 4) if scored else None,
+        "langs": {lang: sum(1 for r in rows if r["lang"] == lang) for lang in {r["lang"] for r in rows}},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("folder")
+    parser.add_argument("--limit", type=int, default=0)
+    args = parser.parse_args()
+
+    images = sorted(
+        os.path.join(args.folder, name) for name in os.listdir(args.folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if args.limit:
+        images = images[:args.limit]
+    if not images:
+        sys.exit(f"No images in {args.folder}")
+
+    results = {"raw": [], "pipeline": []}
+    for path in images:
+        truth_path = os.path.splitext(path)[0] + ".txt"
+        truth = open(truth_path, encoding="utf-8").read() if os.path.exists(truth_path) else None
+        for mode, runner in (("raw", run_raw), ("pipeline", run_pipeline)):
+            text, ms, prep_ms, lang = runner(path)
+            results[mode].append({
+                "ms": ms,
+                "prep_ms": prep_ms,
+                "lang": lang,
+                "accuracy": char_accuracy(text, truth) if truth is not None else None,
+            })
+
+    raw, pipeline = summarise(results["raw"]), summarise(results["pipeline"])
+    print(json.dumps({
+        "images": len(images),
+        "with_ground_truth": sum(1 for r in results["raw"] if r["accuracy"] is not None),
+        "raw": raw,
+        "pipeline": pipeline,
+        "speedup": round(raw["ms_per_image"] / pipeline["ms_per_image"], 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""OCR throughput with resident tesseract engines vs. one tesseract process per image.
+
+    python bench/bench_ocr_pool.py samples/ [--workers 1,2,4] [--backends tesserocr,pytesseract] [--repeat 2]
+
+Sends every image in the folder (repeated --repeat times) through a media
+executor with 1, 2 and 4 CPU workers, exactly like the bot does, and
+prints images/second per backend and pool size as JSON. Engines are
+preloaded first, so the numbers are steady-state throughput.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from media import ocr  # noqa: E402
+from media_executor import MediaExecutor  # noqa: E402
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+async def measure(images, workers: int, backend: str) -> dict:
+    executor = MediaExecutor(cpu_workers=workers, io_workers=1)
+    try:
+        await executor.warmup(ocr.preload, None, backend)
+        start = time.perf_counter()
+        texts = await asyncio.gather(*(executor.run_cpu(ocr.extract_text_from_image, data, backend) for data in images))
+        elapsed = time.perf_counter() - start
+    finally:
+        executor.shutdown(wait=True)
+    return {
+        "backend": backend,
+        "workers": workers,
+        "images": len(images),
+        "seconds": round(elapsed, 2),
+        "images_per_s": round(len(images) / elapsed, 2),
+        "empty_results": sum(1 for t in texts if not t),
+    }
+
+
+async def run(args) -> list:
+    paths = sorted(
+        os.path.join(args.folder, name) for name in os.listdir(args.folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not paths:
+        sys.exit(f"No images in {args.folder}")
+    images = []
+    for path in paths:
+        with open(path, "rb") as f:
+            images.append(f.read())
+    images *= args.repeat
+
+    results = []
+    for backend in args.backends.split(","):
+        if backend == "tesserocr" and ocr.tesserocr is None:
+            results.append({"backend": backend, "skipped": "tesserocr is not installed"})
+            continue
+        for workers in (int(w) for w in args.workers.split(",")):
+            results.append(await measure(images, workers, backend))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("folder")
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--backends", default="tesserocr,pytesseract")
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+    print(json.dumps({"cpu_count": os.cpu_count(), "runs": asyncio.run(run(args))}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Cold start: import time of main and time until the webhook first answers 200.
+
+    python bench/bench_startup.py [--runs 3] [--warmup background|blocking|off] [--media-timeout 120] [--routes 10000]
+
+Runs the fake Bot API (bench/fake_bot_api.py), starts `python main.py`
+against it as a fresh process per run, and POSTs a synthetic update to
+the webhook until it returns 200 (time-to-first-200). It keeps polling /ready/media to see
+when the media engines are warm. Also lists the slowest modules reported
+by `python -X importtime -c "import main"`, and times seeding the route
+store from a --routes-sized routes.json and reopening it (the index load
+every start does; the target is under 100 ms for 10k routes). Prints JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from aiohttp import ClientSession, ClientError
+
+from fake_bot_api import FakeBotAPI, free_port
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from route_store import RouteStore  # noqa: E402
+
+ROUTE_LOAD_TARGET_MS = 100
+
+
+def bot_env(api_port: int, bot_port: int, warmup: str, db_dir: str) -> dict:
+    return dict(
+        os.environ,
+        BOT_TOKEN="123:bench",
+        ADMIN_CHAT_IDS="1",
+        PORT=str(bot_port),
+        TELEGRAM_API_BASE_URL=f"http://127.0.0.1:{api_port}",
+        ROUTES_DB=os.path.join(db_dir, "routes.db"),
+        RESULT_CACHE_DB=os.path.join(db_dir, "results.db"),
+        FORWARD_LOG_DB=os.path.join(db_dir, "forward_log.db"),
+        ROUTES_MAP="-100:-200",
+        MEDIA_WARMUP=warmup,
+    )
+
+
+async def one_run(api_port: int, warmup: str, media_timeout: float) -> dict:
+    bot_port = free_port()
+    update = {
+        "update_id": 1,
+        "message": {"message_id": 1, "date": 0, "chat": {"id": -100, "type": "group"}, "text": "homework page 1"},
+    }
+    with tempfile.TemporaryDirectory() as db_dir:
+        started = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "main.py"], cwd=ROOT, env=bot_env(api_port, bot_port, warmup, db_dir),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        result = {"first_200_s": None, "media_warm_s": None}
+        try:
+            async with ClientSession() as session:
+                while result["first_200_s"] is None and proc.poll() is None:
+                    try:
+                        async with session.post(f"http://127.0.0.1:{bot_port}/", json=update) as resp:
+                            if resp.status == 200:
+                                result["first_200_s"] = round(time.perf_counter() - started, 3)
+                    except ClientError:
+                        await asyncio.sleep(0.01)
+                while warmup != "off" and proc.poll() is None and time.perf_counter() - started < media_timeout:
+                    async with session.get(f"http://127.0.0.1:{bot_port}/ready/media") as resp:
+                        state = (await resp.json())["media"]
+                    if state in ("warm", "failed"):
+                        result["media_warm_s"] = round(time.perf_counter() - started, 3)
+                        result["media"] = state
+                        break
+                    await asyncio.sleep(0.1)
+        finally:
+            proc.terminate()
+            proc.wait()
+    return result
+
+
+def slowest_imports(limit: int = 10) -> list:
+    env = dict(os.environ, BOT_TOKEN="123:bench", ADMIN_CHAT_IDS="1", ROUTES_DB=":memory:")
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT, env=env, capture_output=True, text=True,
+    ).stderr
+    rows = []
+    for line in out.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            rows.append((int(cumulative), name.strip()))
+    rows.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in rows[:limit]]
+
+
+def route_store_startup(count: int) -> dict:
+    """Seed a fresh store from a routes.json with `count` routes, then time reopening it."""
+    filters = ["all", "media", "homework"]
+    data = {
+        str(-1000000 - i // 2): [{"chat_id": -2000000 - i, "filter": filters[i % 3]}]
+        for i in range(0, count, 2)
+    }
+    for i in range(1, count, 2):
+        data[str(-1000000 - i // 2)].append(-2000000 - i)
+    with tempfile.TemporaryDirectory() as tmp:
+        routes_file = os.path.join(tmp, "routes.json")
+        with open(routes_file, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        db = os.path.join(tmp, "routes.db")
+        started = time.perf_counter()
+        store = RouteStore(db)
+        imported = store.import_json(routes_file)
+        seed_ms = (time.perf_counter() - started) * 1000
+        store.close()
+        started = time.perf_counter()
+        store = RouteStore(db)
+        load_ms = (time.perf_counter() - started) * 1000
+        loaded = len(store)
+        store.close()
+    return {
+        "routes": imported,
+        "loaded": loaded,
+        "seed_ms": round(seed_ms, 1),
+        "load_ms": round(load_ms, 1),
+        "load_under_target": load_ms < ROUTE_LOAD_TARGET_MS,
+    }
+
+
+async def run(args) -> dict:
+    api = FakeBotAPI()
+    api_port = await api.start()
+    try:
+        runs = [await one_run(api_port, args.warmup, args.media_timeout) for _ in range(args.runs)]
+    finally:
+        await api.stop()
+    first = [r["first_200_s"] for r in runs if r["first_200_s"] is not None]
+    return {
+        "warmup": args.warmup,
+        "runs": runs,
+        "first_200_median_s": statistics.median(first) if first else None,
+        "slowest_imports": slowest_imports(),
+        "route_store": route_store_startup(args.routes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--warmup", default="background", choices=["background", "blocking", "off"])
+    parser.add_argument("--media-timeout", type=float, default=120)
+    parser.add_argument("--routes", type=int, default=10000, help="routes in the route store startup test")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
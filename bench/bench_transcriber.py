@@ -0,0 +1,83 @@
+"""Batched vs. one-by-one transcription of a burst of voice notes.
+
+    python bench/bench_transcriber.py voice1.ogg voice2.ogg ... [--clips 40] [--batch-sizes 1,4,8,16]
+
+Decodes the given files once, repeats them up to --clips clips, then for
+every batch size submits the whole burst at once (as after the morning
+assembly) and reports audio seconds transcribed per wall second as JSON.
+Batch size 1 is the old one-call-per-file behaviour. Needs ffmpeg and
+faster-whisper with the configured model available locally.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from media import warmup_media_engines  # noqa: E402
+from media.audio import decode_audio  # noqa: E402
+from media.config import SAMPLE_RATE, speech_engine  # noqa: E402
+from media.transcriber import BatchTranscriber  # noqa: E402
+from media_executor import shutdown_media_executor  # noqa: E402
+
+
+async def burst(clips, batch_size, window):
+    transcriber = BatchTranscriber(window=window, max_clips=batch_size, batch_size=batch_size)
+    start = time.perf_counter()
+    texts = await asyncio.gather(*(transcriber.transcribe(clip) for clip in clips))
+    wall = time.perf_counter() - start
+    await transcriber.stop()
+    audio = sum(len(c) for c in clips) / SAMPLE_RATE
+    return {
+        "batch_size": batch_size,
+        "batches": transcriber.batches,
+        "wall_s": round(wall, 2),
+        "audio_s": round(audio, 1),
+        "audio_s_per_wall_s": round(audio / wall, 2),
+        "empty_results": sum(1 for t in texts if not t),
+    }
+
+
+async def run(args):
+    decoded = []
+    for path in args.files:
+        with open(path, "rb") as f:
+            samples = decode_audio(f.read())
+        if samples.size:
+            decoded.append(samples)
+    if not decoded:
+        sys.exit("No decodable audio given")
+    clips = [decoded[i % len(decoded)] for i in range(args.clips)]
+
+    # Load the model in the worker processes first so the first run is not penalised
+    await warmup_media_engines()
+    results = []
+    for batch_size in (int(b) for b in args.batch_sizes.split(",")):
+        results.append(await burst(clips, batch_size, args.window))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--clips", type=int, default=40)
+    parser.add_argument("--batch-sizes", default="1,4,8,16")
+    parser.add_argument("--window", type=float, default=0.5)
+    args = parser.parse_args()
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        shutdown_media_executor()
+    print(json.dumps({
+        "clips": args.clips,
+        "model": speech_engine()[1],
+        "cpu_workers": os.getenv("MEDIA_CPU_WORKERS", "default"),
+        "runs": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
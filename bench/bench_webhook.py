@@ -0,0 +1,86 @@
+"""CPU cost of webhook ingestion per 1000 updates: the old decode-everything path vs. the fast path.
+
+    python bench/bench_webhook.py [--updates 5000] [--other-rate 0.2] [--repeat 5]
+
+Replays generated updates (bench/updates.py) as raw request bodies through
+  - "json+de_json": json.loads and Update.de_json for every update, as
+    main.handle_webhook used to,
+  - "fast": the secret-token check, webhook.loads (orjson when installed)
+    and the update-type filter, with Update.de_json only for wanted updates,
+  - "unauthorized": a request with a wrong secret, which stops at the header check.
+Reports CPU ms per 1000 updates (best of --repeat) and the saving as JSON.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("WEBHOOK_SECRET", "bench-secret")
+
+from telegram import Bot, Update  # noqa: E402
+
+import webhook  # noqa: E402
+from updates import UpdateGenerator  # noqa: E402
+
+SECRET = {webhook.SECRET_HEADER: webhook.WEBHOOK_SECRET}
+WRONG = {webhook.SECRET_HEADER: "wrong"}
+
+
+def baseline(bodies, bot) -> None:
+    for body in bodies:
+        Update.de_json(json.loads(body), bot)
+
+
+def fast(bodies, bot) -> None:
+    for body in bodies:
+        if not webhook.authorized(SECRET):
+            continue
+        data = webhook.loads(body)
+        if webhook.wanted(data):
+            Update.de_json(data, bot)
+
+
+def unauthorized(bodies, bot) -> None:
+    for body in bodies:
+        if webhook.authorized(WRONG):
+            webhook.loads(body)
+
+
+def cpu_ms_per_1k(path, bodies, bot, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        path(bodies, bot)
+        best = min(best, time.process_time() - started)
+    return round(best * 1000 * 1000 / len(bodies), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--other-rate", type=float, default=0.2, help="share of updates of a type no handler uses")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generator = UpdateGenerator([-1000 - i for i in range(1, args.chats + 1)], other_rate=args.other_rate, seed=args.seed)
+    bodies = [json.dumps(update).encode("utf-8") for update in generator.take(args.updates)]
+    bot = Bot("123:bench")
+    results = {name: cpu_ms_per_1k(path, bodies, bot, args.repeat) for name, path in (
+        ("json+de_json", baseline), ("fast", fast), ("unauthorized", unauthorized),
+    )}
+    print(json.dumps({
+        "updates": args.updates,
+        "other_rate": args.other_rate,
+        "decoder": webhook.decoder_name(),
+        "cpu_ms_per_1k_updates": results,
+        "saved_cpu_ms_per_1k_updates": round(results["json+de_json"] - results["fast"], 2),
+        "saved_pct": round(100 * (1 - results["fast"] / results["json+de_json"]), 1),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""A local stand-in for the Telegram Bot API, for benchmarks.
+
+Answers getMe, sends (copyMessage, sendMessage, sendMediaGroup, ...),
+getFile and file downloads. Every call is recorded with its arrival time,
+and latency and 429 flood errors can be injected:
+
+    api = FakeBotAPI(latency=0.05, jitter=0.02, flood_rate=0.01, files={"photos/1.png": png_bytes})
+    port = await api.start()
+    ... TELEGRAM_API_BASE_URL=http://127.0.0.1:{port} ...
+    await api.stop()
+"""
+import asyncio
+import random
+import socket
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from aiohttp import web
+
+SEND_METHODS = {"copyMessage", "copyMessages", "sendMessage", "sendMediaGroup", "forwardMessage"}
+
+
+class Call(NamedTuple):
+    at: float       # time.perf_counter() when the request arrived
+    method: str
+    params: dict
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class FakeBotAPI:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        flood_rate: float = 0.0,
+        retry_after: int = 1,
+        files: Optional[Dict[str, bytes]] = None,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.files = files or {}          # file_id -> bytes; served as file_path == file_id
+        self.calls: List[Call] = []
+        self.floods = 0
+        self._random = random.Random(seed)
+        self._message_id = 0
+        self._runner: Optional[web.AppRunner] = None
+        self.port: Optional[int] = None
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle_method)
+        app.router.add_get("/file/bot{token}/{path:.+}", self.handle_file)
+        return app
+
+    async def start(self, port: Optional[int] = None) -> int:
+        self.port = port or free_port()
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", self.port).start()
+        return self.port
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def sends(self) -> List[Call]:
+        return [call for call in self.calls if call.method in SEND_METHODS]
+
+    async def _params(self, request) -> dict:
+        if request.content_type == "application/json":
+            return await request.json()
+        return dict(await request.post())
+
+    async def _delay(self) -> None:
+        delay = self.latency + (self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def handle_method(self, request):
+        method = request.match_info["method"]
+        params = await self._params(request)
+        await self._delay()
+        if method in SEND_METHODS and self.flood_rate and self._random.random() < self.flood_rate:
+            self.floods += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+        self.calls.append(Call(time.perf_counter(), method, params))
+        if method == "getMe":
+            return web.json_response({"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}})
+        if method == "getFile":
+            file_id = params.get("file_id", "")
+            size = len(self.files.get(file_id, b""))
+            return web.json_response({"ok": True, "result": {
+                "file_id": file_id, "file_unique_id": file_id, "file_size": size, "file_path": file_id,
+            }})
+        self._message_id += 1
+        message = {"message_id": self._message_id, "date": int(time.time()), "chat": {"id": int(params.get("chat_id", 0) or 0), "type": "group"}}
+        if method == "sendMediaGroup":
+            return web.json_response({"ok": True, "result": [message]})
+        if method == "copyMessages":
+            return web.json_response({"ok": True, "result": [{"message_id": self._message_id}]})
+        if method == "copyMessage":
+            return web.json_response({"ok": True, "result": {"message_id": self._message_id}})
+        return web.json_response({"ok": True, "result": message})
+
+    async def handle_file(self, request):
+        data = self.files.get(request.match_info["path"])
+        if data is None:
+            return web.Response(status=404, text="Not Found")
+        await self._delay()
+        return web.Response(body=data)
@@ -0,0 +1,137 @@
+"""Synthetic webhook updates: a reproducible mix of text, photo, voice and video across class chats.
+
+    generator = UpdateGenerator(chats=[-1001, -1002], mix={"text": 0.6, "photo": 0.2, "voice": 0.15, "video": 0.05})
+    updates = generator.take(500)
+    files = generator.files()   # file_id -> bytes, for FakeBotAPI(files=...)
+
+Texts are drawn from homework, chatter and junk phrases; a share of the
+media are reposts of earlier files (same file_unique_id), as when a
+teacher's worksheet is shared into several groups. With other_rate, that
+share of updates are chat_member updates, which no handler uses.
+"""
+import io
+import os
+import random
+from typing import Dict, Iterable, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_VOICE = os.path.join(ROOT, "audio_2025-05-08_16-12-15.ogg")
+
+DEFAULT_MIX = {"text": 0.6, "photo": 0.2, "voice": 0.15, "video": 0.05}
+HOMEWORK = [
+    "Homework: maths page 42, exercises 1 to 10",
+    "Complete the science worksheet before Friday",
+    "English assignment: write a paragraph about your village",
+    "Dzongkha homework chapter 3, learn the new words",
+    "Revise the notes on fractions for the class test",
+]
+CHATTER = ["Good morning class", "Thank you la", "Who has the timetable?", "ok", "Noted sir"]
+JUNK = ["Join fast! cheap price promo @deals", "Big discount today only, promo code 50"]
+
+
+def sample_photo(text: str = "Homework page 12, exercise 3") -> bytes:
+    """A small worksheet-like PNG (needs Pillow)."""
+    from PIL import Image, ImageDraw
+    image = Image.new("L", (900, 600), 255)
+    draw = ImageDraw.Draw(image)
+    for row in range(12):
+        draw.text((60, 40 + row * 45), f"{row + 1}. {text}", fill=0)
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class UpdateGenerator:
+    def __init__(
+        self,
+        chats: Iterable[int],
+        mix: Optional[Dict[str, float]] = None,
+        repost_rate: float = 0.1,
+        junk_rate: float = 0.05,
+        other_rate: float = 0.0,
+        senders_per_chat: int = 30,
+        seed: int = 0,
+    ):
+        self.chats = list(chats)
+        self.mix = mix or DEFAULT_MIX
+        self.repost_rate = repost_rate
+        self.junk_rate = junk_rate
+        self.other_rate = other_rate
+        self.senders_per_chat = senders_per_chat
+        self._random = random.Random(seed)
+        self._update_id = 0
+        self._message_ids = {chat: 0 for chat in self.chats}
+        self._media: Dict[str, List[str]] = {}  # kind -> file ids issued so far
+        self.kinds: Dict[str, int] = {}
+
+    def _text(self) -> str:
+        roll = self._random.random()
+        if roll < self.junk_rate:
+            return self._random.choice(JUNK)
+        return self._random.choice(HOMEWORK if roll < 0.6 else CHATTER)
+
+    def _file_id(self, kind: str) -> str:
+        issued = self._media.setdefault(kind, [])
+        if issued and self._random.random() < self.repost_rate:
+            return self._random.choice(issued)
+        file_id = f"{kind}/{len(issued)}"
+        issued.append(file_id)
+        return file_id
+
+    def _other(self, chat: int) -> dict:
+        """A member joining: an update type the bot has no handler for."""
+        self.kinds["other"] = self.kinds.get("other", 0) + 1
+        user = {"id": abs(chat) * 1000 + self._random.randrange(1000), "is_bot": False, "first_name": "New"}
+        return {"update_id": self._update_id, "chat_member": {
+            "chat": {"id": chat, "type": "supergroup", "title": f"Class {chat}"},
+            "from": user,
+            "date": 0,
+            "old_chat_member": {"status": "left", "user": user},
+            "new_chat_member": {"status": "member", "user": user},
+        }}
+
+    def next(self) -> dict:
+        chat = self._random.choice(self.chats)
+        self._update_id += 1
+        if self.other_rate and self._random.random() < self.other_rate:
+            return self._other(chat)
+        kind = self._random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        self._message_ids[chat] += 1
+        sender = abs(chat) * 1000 + self._random.randrange(self.senders_per_chat)
+        message = {
+            "message_id": self._message_ids[chat],
+            "date": 0,
+            "chat": {"id": chat, "type": "supergroup", "title": f"Class {chat}"},
+            "from": {"id": sender, "is_bot": False, "first_name": f"Student {sender % 1000}"},
+        }
+        if kind == "text":
+            message["text"] = self._text()
+        else:
+            file_id = self._file_id(kind)
+            media = {"file_id": file_id, "file_unique_id": file_id}
+            if kind == "photo":
+                message["photo"] = [dict(media, width=900, height=600)]
+            elif kind == "voice":
+                message["voice"] = dict(media, duration=10, mime_type="audio/ogg")
+            else:
+                message["video"] = dict(media, width=640, height=360, duration=10)
+            if self._random.random() < 0.3:
+                message["caption"] = self._text()
+        self.kinds[kind] = self.kinds.get(kind, 0) + 1
+        return {"update_id": self._update_id, "message": message}
+
+    def take(self, count: int) -> List[dict]:
+        return [self.next() for _ in range(count)]
+
+    def files(self) -> Dict[str, bytes]:
+        """Bytes for every file id issued so far: one photo, and the sample voice note for voice and video."""
+        files = {}
+        photo = sample_photo() if self._media.get("photo") else b""
+        voice = b""
+        if self._media.get("voice") or self._media.get("video"):
+            with open(SAMPLE_VOICE, "rb") as f:
+                voice = f.read()
+        for kind, file_ids in self._media.items():
+            for file_id in file_ids:
+                files[file_id] = photo if kind == "photo" else voice
+        return files
@@ -0,0 +1,192 @@
+import csv
+import json
+import logging
+import math
+import os
+import random
+import sys
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from keywords import scan_keywords
+
+logger = logging.getLogger(__name__)
+
+CLASSIFIER_MODEL = os.getenv("CLASSIFIER_MODEL", "classifier_model.json")
+CLASSIFIER_THRESHOLD = float(os.getenv("CLASSIFIER_THRESHOLD", 0.5))
+# Below this confidence (max(p, 1 - p)) the keyword rules decide instead
+CLASSIFIER_MIN_CONFIDENCE = float(os.getenv("CLASSIFIER_MIN_CONFIDENCE", 0.7))
+
+LABELS = ("homework", "junk")
+
+
+class Verdict(NamedTuple):
+    homework: bool
+    junk: bool
+    source: str                  # "model" if the model decided any label, else "keywords"
+    scores: Dict[str, float]     # model probabilities, empty when no model is loaded
+
+
+class Classifier(ABC):
+    """Scores texts per label; subclasses implement `predict_batch`."""
+
+    name = "base"
+    labels: Tuple[str, ...] = LABELS
+
+    @abstractmethod
+    def predict_batch(self, texts: Sequence[str]) -> List[Dict[str, float]]:
+        """Probability per label for each text."""
+
+    def predict(self, text: str) -> Dict[str, float]:
+        return self.predict_batch([text])[0]
+
+
+class HashedNgramClassifier(Classifier):
+    """One-vs-rest logistic regression over hashed word and character n-grams.
+
+    Features are word uni/bigrams plus character 3-grams (which also cover
+    Dzongkha, where words are not space separated), hashed with crc32 into
+    `dim` buckets. Weights are stored sparsely, so scoring a message is one
+    pass over its n-grams with dict lookups — well under a millisecond.
+    """
+
+    name = "hashed-ngram-lr"
+
+    def __init__(self, heads: Dict[str, Tuple[float, Dict[int, float]]], dim: int = 1 << 18):
+        self.dim = dim
+        self.heads = heads  # label -> (bias, {bucket: weight})
+        self.labels = tuple(heads)
+
+    def features(self, text: str) -> set:
+        text = text.lower()
+        mask = self.dim - 1
+        words = text.split()
+        grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        padded = f" {' '.join(words)} "
+        grams += [padded[i:i + 3] for i in range(len(padded) - 2)]
+        return {zlib.crc32(g.encode("utf-8")) & mask for g in grams}
+
+    def predict_batch(self, texts: Sequence[str]) -> List[Dict[str, float]]:
+        results = []
+        for text in texts:
+            buckets = self.features(text or "")
+            scores = {}
+            for label, (bias, weights) in self.heads.items():
+                z = bias + sum(weights.get(b, 0.0) for b in buckets)
+                scores[label] = 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z))))
+            results.append(scores)
+        return results
+
+    @classmethod
+    def load(cls, path: str) -> "HashedNgramClassifier":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        heads = {
+            label: (head["bias"], {int(k): v for k, v in head["weights"].items()})
+            for label, head in data["heads"].items()
+        }
+        return cls(heads, dim=data["dim"])
+
+    def save(self, path: str) -> None:
+        data = {
+            "model": self.name,
+            "dim": self.dim,
+            "heads": {
+                label: {"bias": bias, "weights": {str(k): round(v, 6) for k, v in weights.items() if abs(v) > 1e-6}}
+                for label, (bias, weights) in self.heads.items()
+            },
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    @classmethod
+    def train(
+        cls,
+        samples: Iterable[Tuple[str, str]],
+        labels: Sequence[str] = LABELS,
+        dim: int = 1 << 18,
+        epochs: int = 8,
+        lr: float = 0.2,
+        l2: float = 1e-6,
+        seed: int = 7,
+    ) -> "HashedNgramClassifier":
+        """SGD logistic regression, one head per label; `samples` are (text, label) pairs."""
+        model = cls({label: (0.0, {}) for label in labels}, dim=dim)
+        data = [(model.features(text), label) for text, label in samples]
+        rng = random.Random(seed)
+        for label in labels:
+            bias, weights = 0.0, {}
+            for epoch in range(epochs):
+                rng.shuffle(data)
+                step = lr / (1 + epoch)
+                for buckets, sample_label in data:
+                    z = bias + sum(weights.get(b, 0.0) for b in buckets)
+                    p = 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z))))
+                    grad = p - (1.0 if sample_label == label else 0.0)
+                    bias -= step * grad
+                    for b in buckets:
+                        w = weights.get(b, 0.0)
+                        weights[b] = w - step * (grad + l2 * w)
+            model.heads[label] = (bias, weights)
+        return model
+
+
+_model: Optional[Classifier] = None
+
+
+def load_classifier(path: str = CLASSIFIER_MODEL) -> Optional[Classifier]:
+    """Load the model file once (and again on /reload_config); keyword rules only when absent."""
+    global _model
+    if not os.path.exists(path):
+        _model = None
+        logger.info("No classifier model found, using keyword rules.")
+        return None
+    try:
+        _model = HashedNgramClassifier.load(path)
+        logger.info(f"Loaded classifier {path} (labels: {', '.join(_model.labels)})")
+    except Exception as e:
+        _model = None
+        logger.error(f"Failed to load classifier {path}: {e}")
+    return _model
+
+
+def _decide(score: Optional[float], keyword_hit: bool) -> Tuple[bool, bool]:
+    """Returns (decision, decided_by_model)."""
+    if score is not None and max(score, 1.0 - score) >= CLASSIFIER_MIN_CONFIDENCE:
+        return score >= CLASSIFIER_THRESHOLD, True
+    return keyword_hit, False
+
+
+def classify_batch(texts: Sequence[str], chat_ids: Optional[Sequence[Optional[int]]] = None) -> List[Verdict]:
+    """Classify several texts with one model call; keyword rules fill in low-confidence labels."""
+    chat_ids = chat_ids or [None] * len(texts)
+    scores = _model.predict_batch(texts) if _model is not None else [{} for _ in texts]
+    verdicts = []
+    for text, chat_id, score in zip(texts, chat_ids, scores):
+        keywords = scan_keywords(text, chat_id)
+        homework, by_model_hw = _decide(score.get("homework"), keywords["homework"] > 0)
+        junk, by_model_junk = _decide(score.get("junk"), keywords["junk"] > 0)
+        source = "model" if by_model_hw or by_model_junk else "keywords"
+        verdicts.append(Verdict(homework, junk, source, score))
+    return verdicts
+
+
+def classify(text: str, chat_id: Optional[int] = None) -> Verdict:
+    return classify_batch([text], [chat_id])[0]
+
+
+load_classifier()
+
+
+if __name__ == "__main__":
+    # python classifier.py train labelled.csv [model.json]
+    # CSV columns: text,label — label is "homework", "junk" or anything else for neither
+    if len(sys.argv) not in (3, 4) or sys.argv[1] != "train":
+        sys.exit("Usage: python classifier.py train <labelled.csv> [model.json]")
+    with open(sys.argv[2], newline="", encoding="utf-8") as f:
+        rows = [(row["text"], row["label"].strip().lower()) for row in csv.DictReader(f)]
+    out = sys.argv[3] if len(sys.argv) == 4 else CLASSIFIER_MODEL
+    trained = HashedNgramClassifier.train(rows)
+    trained.save(out)
+    print(f"Trained on {len(rows)} rows, saved to {out}")
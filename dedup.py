@@ -0,0 +1,256 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from telegram import Message
+
+logger = logging.getLogger(__name__)
+
+DEDUP_SIZE = int(os.getenv("DEDUP_SIZE", 20000))
+DEDUP_TTL = float(os.getenv("DEDUP_TTL", 12 * 3600))  # seconds
+DEDUP_DB = os.getenv("DEDUP_DB", "")                   # empty: memory only
+# How many recent update_ids the webhook remembers to drop redeliveries (0 turns it off)
+UPDATE_WINDOW = int(os.getenv("UPDATE_WINDOW", 65536))
+UPDATE_WINDOW_SAVE = float(os.getenv("UPDATE_WINDOW_SAVE", 5))  # seconds between saves to DEDUP_DB
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU with per-entry expiry and hit/miss/eviction counters."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is not None:
+            if entry[0] > time.time():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._data[key]
+            self.expirations += 1
+        self.misses += 1
+        return default
+
+    def set(self, key, value, expires_at: Optional[float] = None) -> None:
+        self._data[key] = (expires_at or time.time() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "capacity": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def media_unique_id(message: Message) -> Optional[str]:
+    """Telegram's file_unique_id of the message's media (same file -> same id, across chats)."""
+    if message.photo:
+        return message.photo[-1].file_unique_id
+    media = (
+        message.document or message.video or message.voice or message.audio
+        or message.video_note or message.animation or message.sticker
+    )
+    return media.file_unique_id if media else None
+
+
+def text_hash(text: Optional[str]) -> str:
+    """Hash of the text with case and whitespace normalised."""
+    normalised = " ".join((text or "").lower().split())
+    return hashlib.blake2b(normalised.encode("utf-8"), digest_size=12).hexdigest()
+
+
+class DedupCache:
+    """Remembers what was already delivered, so reposts cost nothing.
+
+    `delivered` / `mark_delivered` track a content key (file_unique_id +
+    text hash) per target, so a target never gets the same item twice
+    within the TTL. OCR/transcription results live in result_cache.
+
+    Entries live in an in-memory LRU; with DEDUP_DB they are also written
+    to SQLite and survive restarts.
+    """
+
+    def __init__(self, maxsize: int = DEDUP_SIZE, ttl: float = DEDUP_TTL, db_path: str = DEDUP_DB):
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize, ttl)
+        self._conn = None
+        self.duplicates = 0
+        if db_path:
+            self._conn = sqlite3.connect(db_path)
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS dedup (key TEXT PRIMARY KEY, value TEXT, expires_at REAL NOT NULL)"
+                )
+                self._conn.execute("DELETE FROM dedup WHERE expires_at < ?", (time.time(),))
+
+    def _get(self, key: str) -> Any:
+        value = self._cache.get(key, _MISSING)
+        if value is _MISSING and self._conn is not None:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM dedup WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+            if row is not None:
+                value = row[0]
+                self._cache.set(key, value, expires_at=row[1])
+        return value
+
+    def _set(self, key: str, value: str) -> None:
+        self._cache.set(key, value)
+        if self._conn is not None:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO dedup (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, time.time() + self.ttl),
+                )
+
+    def content_key(self, message: Message) -> Optional[str]:
+        """None for messages with neither media nor text (polls, locations, dice...): those are never deduplicated."""
+        file_id = media_unique_id(message)
+        text = message.text or message.caption
+        if file_id is None and not text:
+            return None
+        return f"{file_id or '-'}:{text_hash(text)}"
+
+    def delivered(self, content_key: str, target_chat_id: int) -> bool:
+        if self._get(f"d:{target_chat_id}:{content_key}") is _MISSING:
+            return False
+        self.duplicates += 1
+        return True
+
+    def mark_delivered(self, content_key: str, target_chat_id: int) -> None:
+        self._set(f"d:{target_chat_id}:{content_key}", "1")
+
+    def stats(self) -> dict:
+        return dict(self._cache.stats(), duplicates=self.duplicates, persistent=self._conn is not None)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+
+
+class UpdateWindow:
+    """The last `size` update_ids seen by the webhook, as a ring of bits.
+
+    Telegram numbers updates sequentially and redelivers one whenever the
+    webhook answers slowly or with an error, so a bit per id behind the
+    highest one seen (8 KB for 65536 ids) is enough to recognise repeats
+    before Update.de_json. An id more than `size` below the highest one
+    means Telegram restarted the sequence (it does after a quiet week),
+    so the window starts over there instead of dropping everything.
+
+    With DEDUP_DB the window is saved every UPDATE_WINDOW_SAVE seconds and
+    on close, so redeliveries right after a restart are caught too.
+    """
+
+    def __init__(self, size: int = UPDATE_WINDOW, db_path: str = DEDUP_DB, save_every: float = UPDATE_WINDOW_SAVE):
+        self.size = max(8, size + (-size % 8))
+        self._bits = bytearray(self.size // 8)
+        self.high: Optional[int] = None
+        self.redeliveries = 0
+        self.resets = 0
+        self.save_every = save_every
+        self._saved_at = time.monotonic()
+        self._dirty = False
+        self._conn = None
+        if db_path:
+            self._conn = sqlite3.connect(db_path)
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS update_window "
+                    "(id INTEGER PRIMARY KEY CHECK (id = 0), high INTEGER NOT NULL, size INTEGER NOT NULL, bits BLOB NOT NULL)"
+                )
+            row = self._conn.execute("SELECT high, size, bits FROM update_window WHERE id = 0").fetchone()
+            if row is not None and row[1] == self.size:
+                self.high, self._bits = row[0], bytearray(row[2])
+                logger.info(f"Update window restored up to update {self.high}")
+
+    def _flip(self, update_id: int, on: bool) -> None:
+        bit = update_id % self.size
+        if on:
+            self._bits[bit >> 3] |= 1 << (bit & 7)
+        else:
+            self._bits[bit >> 3] &= ~(1 << (bit & 7)) & 0xFF
+
+    def _advance(self, update_id: int) -> None:
+        """Move the window's top to `update_id`, clearing the bits of the ids it passes."""
+        if update_id - self.high >= self.size:
+            self._bits = bytearray(self.size // 8)
+        else:
+            for skipped in range(self.high + 1, update_id + 1):
+                self._flip(skipped, False)
+        self.high = update_id
+
+    def seen(self, update_id: int) -> bool:
+        """True if `update_id` was already accepted; otherwise marks it and returns False."""
+        if self.high is None or update_id <= self.high - self.size:
+            if self.high is not None:
+                self.resets += 1
+                logger.warning(f"Update ids restarted at {update_id} (was {self.high}), resetting the window")
+            self.high = update_id
+            self._bits = bytearray(self.size // 8)
+        elif update_id > self.high:
+            self._advance(update_id)
+        else:
+            bit = update_id % self.size
+            if self._bits[bit >> 3] & (1 << (bit & 7)):
+                self.redeliveries += 1
+                return True
+        self._flip(update_id, True)
+        self._dirty = True
+        if self._conn is not None and time.monotonic() - self._saved_at >= self.save_every:
+            self.save()
+        return False
+
+    def forget(self, update_id: int) -> None:
+        """Unmark an update that was not processed after all, so its redelivery is accepted."""
+        if self.high is not None and self.high - self.size < update_id <= self.high:
+            self._flip(update_id, False)
+            self._dirty = True
+
+    def save(self) -> None:
+        self._saved_at = time.monotonic()
+        if self._conn is None or self.high is None or not self._dirty:
+            return
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO update_window (id, high, size, bits) VALUES (0, ?, ?, ?)",
+                (self.high, self.size, bytes(self._bits)),
+            )
+        self._dirty = False
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "high": self.high,
+            "redeliveries": self.redeliveries,
+            "resets": self.resets,
+            "persistent": self._conn is not None,
+        }
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self.save()
+            self._conn.close()
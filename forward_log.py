@@ -0,0 +1,183 @@
+import logging
+import os
+import sqlite3
+import time
+from collections import deque
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+FORWARD_LOG_DB = os.getenv("FORWARD_LOG_DB", "forward_log.db")
+FORWARD_LOG_RECENT = int(os.getenv("FORWARD_LOG_RECENT", 200))  # entries kept in RAM
+# Entries older than this are pruned from disk; the per-day counters are kept
+FORWARD_LOG_RETENTION_DAYS = int(os.getenv("FORWARD_LOG_RETENTION_DAYS", 90))
+
+# Applied in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    """
+    CREATE TABLE entries (
+        id INTEGER PRIMARY KEY,
+        ts REAL NOT NULL,
+        source INTEGER NOT NULL,
+        message_id INTEGER NOT NULL,
+        targets TEXT NOT NULL,
+        homework INTEGER NOT NULL,
+        text TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX entries_ts ON entries (ts)",
+    """
+    CREATE TABLE daily_counts (
+        day TEXT NOT NULL,
+        source INTEGER NOT NULL,
+        messages INTEGER NOT NULL DEFAULT 0,
+        homework INTEGER NOT NULL DEFAULT 0,
+        deliveries INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, source)
+    )
+    """,
+]
+
+
+class ForwardEntry(NamedTuple):
+    ts: float
+    source: int
+    message_id: int
+    targets: Tuple[int, ...]
+    homework: bool
+    text: str
+
+
+class DayCount(NamedTuple):
+    day: str          # local date, YYYY-MM-DD
+    source: int
+    messages: int
+    homework: int
+    deliveries: int   # messages x targets
+
+
+def day_of(ts: float) -> str:
+    return time.strftime("%Y-%m-%d", time.localtime(ts))
+
+
+class ForwardLog:
+    """Every forwarded message, appended to SQLite, with counters per class and day.
+
+    Recent entries are also kept in a fixed-size ring buffer, and the
+    daily counters are updated in the same transaction as each append, so
+    summaries read days x classes rows instead of scanning the log. Entries
+    older than the retention window are pruned once a day; memory use does
+    not grow with uptime.
+    """
+
+    def __init__(
+        self,
+        path: str = FORWARD_LOG_DB,
+        recent_size: int = FORWARD_LOG_RECENT,
+        retention_days: int = FORWARD_LOG_RETENTION_DAYS,
+    ):
+        self.path = path
+        self.retention_days = retention_days
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self._recent = deque(maxlen=max(1, recent_size))
+        rows = self._conn.execute(
+            "SELECT ts, source, message_id, targets, homework, text FROM entries ORDER BY id DESC LIMIT ?",
+            (self._recent.maxlen,),
+        ).fetchall()
+        for ts, source, message_id, targets, homework, text in reversed(rows):
+            self._recent.append(ForwardEntry(ts, source, message_id, _parse_targets(targets), bool(homework), text))
+        self.appended = 0
+        self.pruned = 0
+        self._pruned_day = None
+        self.prune()
+
+    def _migrate(self) -> None:
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, statement in enumerate(MIGRATIONS[version:], start=version + 1):
+            with self._conn:
+                self._conn.execute(statement)
+                self._conn.execute(f"PRAGMA user_version = {number}")
+            logger.info(f"Forward log migrated to schema v{number}")
+
+    def record(
+        self,
+        source: int,
+        message_id: int,
+        targets: Sequence[int],
+        text: str,
+        homework: bool,
+        ts: Optional[float] = None,
+    ) -> ForwardEntry:
+        """Log one message forwarded from `source` to `targets` (text is truncated to 200 chars)."""
+        ts = time.time() if ts is None else ts
+        entry = ForwardEntry(ts, source, message_id, tuple(targets), bool(homework), (text or "")[:200])
+        day = day_of(ts)
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO entries (ts, source, message_id, targets, homework, text) VALUES (?, ?, ?, ?, ?, ?)",
+                (ts, source, message_id, ",".join(map(str, entry.targets)), int(entry.homework), entry.text),
+            )
+            self._conn.execute(
+                "INSERT INTO daily_counts (day, source, messages, homework, deliveries) VALUES (?, ?, 1, ?, ?) "
+                "ON CONFLICT (day, source) DO UPDATE SET messages = messages + 1, "
+                "homework = homework + excluded.homework, deliveries = deliveries + excluded.deliveries",
+                (day, source, int(entry.homework), len(entry.targets)),
+            )
+        self._recent.append(entry)
+        self.appended += 1
+        if day != self._pruned_day:
+            self.prune()
+        return entry
+
+    def recent(self, limit: Optional[int] = None) -> List[ForwardEntry]:
+        """Newest entries last."""
+        entries = list(self._recent)
+        return entries[-limit:] if limit else entries
+
+    def daily_counts(self, days: int = 7) -> List[DayCount]:
+        """Counters for the last `days` days (today included), oldest first."""
+        since = day_of(time.time() - (days - 1) * 86400)
+        rows = self._conn.execute(
+            "SELECT day, source, messages, homework, deliveries FROM daily_counts WHERE day >= ? ORDER BY day, source",
+            (since,),
+        )
+        return [DayCount(*row) for row in rows]
+
+    def prune(self) -> int:
+        """Delete entries past the retention window. Returns rows removed."""
+        self._pruned_day = day_of(time.time())
+        if not self.retention_days:
+            return 0
+        with self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM entries WHERE ts < ?", (time.time() - self.retention_days * 86400,)
+            )
+        if cursor.rowcount:
+            self.pruned += cursor.rowcount
+            logger.info(f"Forward log pruned {cursor.rowcount} entries older than {self.retention_days} days")
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        """Forget every entry and counter."""
+        with self._conn:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM daily_counts")
+        self._recent.clear()
+
+    def stats(self) -> dict:
+        return {
+            "recent": len(self._recent),
+            "appended": self.appended,
+            "pruned": self.pruned,
+            "retention_days": self.retention_days,
+        }
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _parse_targets(text: str) -> Tuple[int, ...]:
+    return tuple(int(t) for t in text.split(",") if t)
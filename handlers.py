@@ -1,7 +1,23 @@
+import asyncio
 import logging
-from telegram import Update
-from telegram.ext import CommandHandler, MessageHandler, Filters, CallbackContext
-from utils import is_admin, is_homework_text, is_junk_message, extract_text_from_image, transcribe_audio
+import time
+from dotenv import load_dotenv
+from telegram import ChatPermissions, Update
+from telegram.ext import CommandHandler, MessageHandler, filters, CallbackContext
+from utils import (
+    is_admin,
+    is_homework_text,
+    is_junk_message,
+    forward_message_to_parent_group,
+)
+from routing import FILTER_ALL, is_service_message
+from keywords import load_keywords
+from media.models import load_model_config
+from classifier import classify, load_classifier
+from spam_tracker import SPAM_ACTION
+from media import media_kind
+from metrics import FORWARD_SECONDS, MESSAGES, STAGE_SECONDS
+from tracing import annotate, span
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -38,11 +54,13 @@ async def help_command(update: Update, context: CallbackContext) -> None:
     """
     if is_admin(user.id):  # Admin-only commands
         help_text += """
-        /list_senders - View sender activity logs 📜
-        /delete_senders - Delete sender activity logs 🗑️
+        /list_senders - View the top junk senders 📜
+        /clear_senders - Forget (and unblock) junk senders 🗑️
         /list_routes - View the current route list 🛤️
-        /add_routes - Add a new route ➕
-        /delete_routes - Delete an existing route ❌
+        /add_route - Add a new route ➕
+        /delete_route - Delete an existing route ❌
+        /reload_config - Reload .env and routes without a restart ♻️
+        /profile - Start, stop or dump the sampling profiler 🔬
         /weekly_summary - View the weekly homework summary 📅
         /clear_homework_log - Clear the homework log 🧹
         """
@@ -56,72 +74,270 @@ async def get_id(update: Update, context: CallbackContext) -> None:
     user = update.message.from_user
     await update.message.reply_text(f"Your Telegram ID: {user.id} 🆔")
 
-# Admin command to list senders' activity
+# Admin command to list the worst junk senders: /list_senders [count]
 async def list_senders(update: Update, context: CallbackContext) -> None:
     if not is_admin(update.message.from_user.id):
         await update.message.reply_text("You are not authorized to use this command. 🚫")
         return
-    senders_activity = bot_data.get("senders_activity", [])
-    activity_text = "\n".join([f"{activity['name']} ({activity['id']}): {activity['last_message']}" for activity in senders_activity])
-    await update.message.reply_text(f"Sender Activity Logs: 📝\n{activity_text or 'No activity recorded.'}")
+    try:
+        count = int(context.args[0]) if context.args else 10
+    except ValueError:
+        await update.message.reply_text("Usage: /list_senders [count] 📝")
+        return
+    now = time.time()
+    lines = [
+        f"{offender.name or 'unknown'} ({offender.sender_id}): {offender.total} junk, {offender.recent} recently"
+        + (f", blocked until {datetime.fromtimestamp(offender.blocked_until):%H:%M} ⛔" if offender.blocked_until > now else "")
+        for offender in context.bot_data["SPAM_SENDERS"].top(count)
+    ]
+    await update.message.reply_text("Top junk senders: 📝\n" + ("\n".join(lines) or "No junk recorded."))
 
-# Admin command to delete sender activity
+# Admin command to forget junk senders (unblocking them): /clear_senders [sender_id]
 async def delete_sender_activity(update: Update, context: CallbackContext) -> None:
     if not is_admin(update.message.from_user.id):
         await update.message.reply_text("You are not authorized to use this command. 🚫")
         return
-    bot_data["senders_activity"] = []
-    await update.message.reply_text("Sender activity logs have been cleared. 🧹")
+    try:
+        sender_id = int(context.args[0]) if context.args else None
+    except ValueError:
+        await update.message.reply_text("Usage: /clear_senders [sender_id] 📝")
+        return
+    removed = context.bot_data["SPAM_SENDERS"].clear(sender_id)
+    await update.message.reply_text(f"Cleared {removed} sender(s) from the junk tracker. 🧹")
+
+clear_senders = delete_sender_activity
 
 # Admin command to list routes
 async def list_routes(update: Update, context: CallbackContext) -> None:
     if not is_admin(update.message.from_user.id):
         await update.message.reply_text("You are not authorized to use this command. 🚫")
         return
-    routes = os.getenv("ROUTES_MAP")  # or bot_data["routes"]
-    await update.message.reply_text(f"Current routes: 📍{routes}")
+    store = context.bot_data["ROUTE_STORE"]
+    lines = [
+        f"{source} ➡️ {target.chat_id}" + (f" ({target.filter})" if target.filter != FILTER_ALL else "")
+        for source, targets in sorted(store.routes.items())
+        for target in targets
+    ]
+    routes = "\n".join(lines) or "No routes configured."
+    await update.message.reply_text(f"Current routes: 📍\n{routes}")
 
-# Admin command to add a route
+# Admin command to add a route: /add_route <source> <target> [all|media|homework]
 async def add_route(update: Update, context: CallbackContext) -> None:
     if not is_admin(update.message.from_user.id):
         await update.message.reply_text("You are not authorized to use this command. 🚫")
         return
-    new_route = context.args
-    if new_route:
-        bot_data["routes"].append(new_route)
-        await update.message.reply_text(f"Route {new_route} added successfully. ✅")
-    else:
-        await update.message.reply_text("Please provide the route to add. 📝")
+    try:
+        source, target = int(context.args[0]), int(context.args[1])
+        route_filter = context.args[2].lower() if len(context.args) > 2 else FILTER_ALL
+        context.bot_data["ROUTE_STORE"].add(source, target, route_filter)
+    except (IndexError, ValueError, TypeError):
+        await update.message.reply_text("Usage: /add_route <source> <target> [all|media|homework] 📝")
+        return
+    await update.message.reply_text(f"Route {source} ➡️ {target} ({route_filter}) added successfully. ✅")
 
-# Admin command to delete a route
+# Admin command to delete a route: /delete_route <source> [target]
 async def delete_route(update: Update, context: CallbackContext) -> None:
     if not is_admin(update.message.from_user.id):
         await update.message.reply_text("You are not authorized to use this command. 🚫")
         return
-    route_to_delete = context.args[0] if context.args else None
-    if route_to_delete:
-        bot_data["routes"] = [route for route in bot_data["routes"] if route != route_to_delete]
-        await update.message.reply_text(f"Route {route_to_delete} deleted successfully. ❌")
+    try:
+        source = int(context.args[0])
+        target = int(context.args[1]) if len(context.args) > 1 else None
+    except (IndexError, ValueError, TypeError):
+        await update.message.reply_text("Usage: /delete_route <source> [target] 📝")
+        return
+    removed = context.bot_data["ROUTE_STORE"].delete(source, target)
+    if removed:
+        await update.message.reply_text(f"Deleted {removed} route(s) for {source}. ❌")
     else:
-        await update.message.reply_text("Please provide the route to delete. 📝")
+        await update.message.reply_text(f"No matching route for {source}. 🤷")
 
-# Admin command to get weekly homework summary
+# Admin command to get weekly homework summary (reads the per-class daily counters, not the log)
 async def weekly_summary(update: Update, context: CallbackContext) -> None:
     if not is_admin(update.message.from_user.id):
         await update.message.reply_text("You are not authorized to use this command. 🚫")
         return
-    homework_summary = bot_data.get("homework_log", [])
-    summary_text = "\n".join([f"Week {i+1}: {log['summary']}" for i, log in enumerate(homework_summary)])
-    await update.message.reply_text(f"Weekly Homework Summary: 🗓️\n{summary_text or 'No summary available.'}")
+    by_class, by_day = {}, {}
+    for count in context.bot_data["FORWARD_LOG"].daily_counts(7):
+        totals = by_class.setdefault(count.source, [0, 0])
+        totals[0] += count.homework
+        totals[1] += count.messages
+        by_day[count.day] = by_day.get(count.day, 0) + count.homework
+    if not by_class:
+        await update.message.reply_text("Weekly Homework Summary: 🗓️\nNo summary available.")
+        return
+    class_lines = [
+        f"{source}: {homework} homework / {messages} forwarded"
+        for source, (homework, messages) in sorted(by_class.items(), key=lambda item: -item[1][0])
+    ]
+    day_lines = [f"{day}: {homework} homework" for day, homework in sorted(by_day.items())]
+    await update.message.reply_text(
+        "Weekly Homework Summary: 🗓️\n" + "\n".join(class_lines) + "\n\nBy day: 📆\n" + "\n".join(day_lines)
+    )
 
 # Admin command to clear homework log
 async def clear_homework_log(update: Update, context: CallbackContext) -> None:
     if not is_admin(update.message.from_user.id):
         await update.message.reply_text("You are not authorized to use this command. 🚫")
         return
-    bot_data["homework_log"] = []
+    context.bot_data["FORWARD_LOG"].clear()
     await update.message.reply_text("Homework log cleared. 🧹")
 
+# Admin command for the sampling profiler: /profile start|stop|dump|status
+async def profile(update: Update, context: CallbackContext) -> None:
+    if not is_admin(update.message.from_user.id):
+        await update.message.reply_text("You are not authorized to use this command. 🚫")
+        return
+    profiler = context.bot_data["PROFILER"]
+    action = context.args[0].lower() if context.args else "status"
+    if action == "start":
+        profiler.reset()
+        profiler.start()
+        await update.message.reply_text("Profiler started. 🔬")
+    elif action == "stop":
+        profiler.stop()
+        await update.message.reply_text(f"Profiler stopped after {profiler.samples} samples. ⏹️")
+    elif action == "dump":
+        path = profiler.dump()
+        top = "\n".join(f"{count} {frame}" for frame, count in profiler.top())
+        await update.message.reply_text(f"Wrote {profiler.samples} samples to {path} 📄\n{top}")
+    elif action == "status":
+        state = "running" if profiler.running else "stopped"
+        await update.message.reply_text(f"Profiler {state}, {profiler.samples} samples. 🔬")
+    else:
+        await update.message.reply_text("Usage: /profile start|stop|dump|status 📝")
+
+# Admin command to reload .env and the route map
+async def reload_config(update: Update, context: CallbackContext) -> None:
+    if not is_admin(update.message.from_user.id):
+        await update.message.reply_text("You are not authorized to use this command. 🚫")
+        return
+    load_dotenv(override=True)
+    store = context.bot_data["ROUTE_STORE"]
+    store.reload()
+    load_keywords()
+    load_classifier()
+    load_model_config()
+    await update.message.reply_text(f"Config reloaded. {len(store)} routes active. ♻️")
+
+# Take a blocked sender's right to post in the class group for the block period
+async def mute_sender(context: CallbackContext, chat_id: int, user_id: int, seconds: float) -> None:
+    try:
+        await context.bot.restrict_chat_member(
+            chat_id, user_id, ChatPermissions(can_send_messages=False), until_date=int(time.time() + seconds)
+        )
+        logger.info(f"Muted {user_id} in {chat_id} for {seconds:.0f}s")
+    except Exception as e:
+        logger.warning(f"Failed to mute {user_id} in {chat_id}: {e}")
+
+# End-to-end forward latency (handling started -> delivered), observed when a send succeeds
+def _forward_timer(started: float, media_type: str, route: str):
+    def observe(future):
+        if not future.cancelled() and future.exception() is None:
+            FORWARD_SECONDS.observe(time.perf_counter() - started, media=media_type, route=route)
+    return observe
+
+def _mark_delivered(dedup, content_key: str, target_chat_id: int):
+    """Record the content as delivered only once the send went through, so a dropped or failed send can be reposted."""
+    def mark(future):
+        if not future.cancelled() and future.exception() is None:
+            dedup.mark_delivered(content_key, target_chat_id)
+    return mark
+
+def _log_forward(forward_log, message, text: str, is_homework: bool, sends):
+    """Log the message once all its sends settled, with only the targets that actually got it."""
+    def record(_):
+        targets = [chat_id for chat_id, future in sends if not future.cancelled() and future.exception() is None]
+        if targets:
+            forward_log.record(message.chat_id, message.message_id, targets, text, is_homework)
+    return record
+
+# Called as an update joins its chat's lane in the update queue: transcription of
+# voice notes and audio starts right away (up to MEDIA_PREFETCH at once), so a burst
+# from one class is batched instead of each note waiting for the one before it.
+# handle_message picks up the text.
+def prefetch_media(update: Update, bot_data: dict) -> None:
+    message = update.effective_message
+    media = bot_data.get("MEDIA")
+    if message is None or media is None or message.text or message.caption:
+        return
+    if not bot_data["ROUTE_STORE"].get(message.chat_id):
+        return
+    # Blocked senders are dropped by handle_message; reposts hit the result cache anyway
+    spam = bot_data.get("SPAM_SENDERS")
+    sender = message.from_user or message.sender_chat
+    if spam and sender and SPAM_ACTION != "off" and spam.is_blocked(sender.id):
+        return
+    media.prefetch(message)
+
+# Forward homework from a routed class group to all of its target groups.
+# Ordering within a chat is guaranteed by the update queue (see main.update_chat_key).
+async def handle_message(update: Update, context: CallbackContext) -> None:
+    message = update.effective_message
+    if message is None:
+        return
+    targets = context.bot_data["ROUTE_STORE"].get(message.chat_id)
+    if not targets or is_service_message(message):
+        return
+    started = time.perf_counter()
+    media_type = media_kind(message) or ("text" if message.text else "other")
+    annotate(source=message.chat_id, media=media_type)
+
+    # Blocked junk senders are dropped before any OCR/transcription is spent on them
+    spam = context.bot_data.get("SPAM_SENDERS")
+    sender = message.from_user or message.sender_chat
+    if spam and sender and SPAM_ACTION != "off" and spam.blocked(sender.id):
+        logger.info(f"Dropped message from blocked sender {sender.id} in {message.chat_id}")
+        MESSAGES.inc(media=media_type, outcome="blocked")
+        return
+
+    # Reposts: drop targets that already got this content before doing any work
+    dedup = context.bot_data.get("DEDUP")
+    content_key = dedup.content_key(message) if dedup else None
+    if content_key is not None:
+        targets = [t for t in targets if not dedup.delivered(content_key, t.chat_id)]
+        if not targets:
+            logger.info(f"Skipped duplicate message from {message.chat_id}")
+            MESSAGES.inc(media=media_type, outcome="duplicate")
+            return
+
+    # Classify (and OCR/transcribe) once, however many targets the source fans out to
+    text = message.text or message.caption or ""
+    media = context.bot_data.get("MEDIA")
+    if not text and media is not None:
+        text = (await media.extract_text(message)).text
+    with STAGE_SECONDS.time(stage="classify", media=media_type), span("classify"):
+        verdict = classify(text, message.chat_id)
+    if verdict.junk:
+        logger.info(f"Ignored junk message from {message.chat_id} ({verdict.source})")
+        MESSAGES.inc(media=media_type, outcome="junk")
+        if spam and sender and not is_admin(sender.id):
+            name = getattr(sender, "full_name", None) or getattr(sender, "title", None) or ""
+            if spam.record_junk(sender.id, name) and SPAM_ACTION == "mute" and message.from_user:
+                await mute_sender(context, message.chat_id, sender.id, spam.block_seconds)
+        return
+    is_homework = verdict.homework
+
+    delivered = [t for t in targets if t.accepts(message, is_homework)]
+    if not delivered:
+        logger.info(f"Ignored non-homework message from {message.chat_id}")
+        MESSAGES.inc(media=media_type, outcome="ignored")
+        return
+    MESSAGES.inc(media=media_type, outcome="forwarded")
+    annotate(routes=[f"{message.chat_id}:{t.chat_id}" for t in delivered])
+    sends = []
+    for target in delivered:
+        # Each call only queues a send, so all targets are served concurrently
+        future = forward_message_to_parent_group(context, message, target.chat_id)
+        future.add_done_callback(_forward_timer(started, media_type, f"{message.chat_id}:{target.chat_id}"))
+        if content_key is not None:
+            future.add_done_callback(_mark_delivered(dedup, content_key, target.chat_id))
+        sends.append((target.chat_id, future))
+    forward_log = context.bot_data.get("FORWARD_LOG")
+    if forward_log is not None:
+        settled = asyncio.gather(*(future for _, future in sends), return_exceptions=True)
+        settled.add_done_callback(_log_forward(forward_log, message, text, is_homework, sends))
+
 # Forward homework messages (text, image, audio, video)
 async def forward_homework(update: Update, context: CallbackContext) -> None:
     message = update.message
@@ -155,10 +371,10 @@ def main():
     application.add_handler(CommandHandler("clear_homework_log", clear_homework_log))
 
     # Forward homework logic
-    application.add_handler(MessageHandler(Filters.text & ~Filters.command, forward_homework))
-    application.add_handler(MessageHandler(Filters.photo, forward_homework))
-    application.add_handler(MessageHandler(Filters.audio, forward_homework))
-    application.add_handler(MessageHandler(Filters.video, forward_homework))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, forward_homework))
+    application.add_handler(MessageHandler(filters.PHOTO, forward_homework))
+    application.add_handler(MessageHandler(filters.AUDIO, forward_homework))
+    application.add_handler(MessageHandler(filters.VIDEO, forward_homework))
 
     application.run_polling()
 
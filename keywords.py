@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+KEYWORDS_FILE = os.getenv("KEYWORDS_FILE", "keywords.json")
+KEYWORD_CACHE_SIZE = int(os.getenv("KEYWORD_CACHE_SIZE", 100_000))
+
+# Same lists the old per-call helpers used (utils.is_junk_message / is_homework_text,
+# backup/utils.is_homework), so verdicts do not change.
+DEFAULT_KEYWORDS = {
+    "junk": ["/nayavpn", "promo", "cheap price", "@", "join fast", "discount"],
+    "homework": ["homework", "classwork", "assignment", "exercise", "page", "question", "write", "draw"],
+    "strong": [
+        "homework", "assignment", "worksheet", "submit",
+        "classwork", "question", "due", "test", "exam",
+        "page", "chapter", "topic", "notes", "activity", "class test",
+    ],
+    "weak": [
+        "work", "read", "write", "draw", "solve", "fill",
+        "copy", "prepare", "practice", "home task",
+    ],
+    "hint": ["page", "submit", "due", "q.", "ex.", "exercise", "copy this"],
+}
+
+_EMPTY = Counter()
+
+
+class KeywordEngine:
+    """Scores every keyword category in one pass over a message.
+
+    Matching keeps the old case-insensitive substring semantics. The text is
+    split on single spaces, so a keyword without spaces can only ever sit
+    inside one token; what each token contains is worked out once and
+    memoised, and a message costs one lower/split plus set operations
+    against the tokens already known to carry keywords. Phrases (keywords
+    with spaces) are confirmed with one substring check when a token that
+    can start them shows up.
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]], cache_size: int = KEYWORD_CACHE_SIZE):
+        self.categories = {name: sorted({kw.lower() for kw in kws if kw}) for name, kws in categories.items()}
+        self._keyword_categories = {}
+        for name, kws in self.categories.items():
+            for kw in kws:
+                self._keyword_categories.setdefault(kw, []).append(name)
+        self._words = [kw for kw in self._keyword_categories if " " not in kw]
+        self._phrases = [(kw, kw.split(" ")[0]) for kw in self._keyword_categories if " " in kw]
+        self._cache_size = cache_size
+        self._seen = set()   # tokens already analysed
+        self._hot = {}       # token -> (keywords inside it, phrases it may start)
+        self._hot_tokens = set()
+        self._scores = {}    # frozenset of matched keywords -> Counter
+
+    def _analyse(self, token: str) -> None:
+        words = tuple(kw for kw in self._words if kw in token)
+        phrases = tuple(kw for kw, first in self._phrases if token.endswith(first))
+        if words or phrases:
+            self._hot[token] = (words, phrases)
+            self._hot_tokens.add(token)
+
+    def matches(self, text: Optional[str]) -> FrozenSet[str]:
+        """All keywords that occur in `text`."""
+        if not text:
+            return frozenset()
+        lowered = text.lower()
+        tokens = lowered.split(" ")
+        if not self._seen.issuperset(tokens):
+            new = set(tokens) - self._seen
+            if len(self._seen) + len(new) > self._cache_size:
+                self._seen.clear()
+                self._hot.clear()
+                self._hot_tokens.clear()
+                new = set(tokens)  # tokens seen before the clear need analysing again
+            for token in new:
+                self._analyse(token)
+            self._seen |= new
+        hot = self._hot_tokens.intersection(tokens)
+        if not hot:
+            return frozenset()
+        found = set()
+        for token in hot:
+            words, phrases = self._hot[token]
+            found.update(words)
+            for phrase in phrases:
+                if phrase in lowered:
+                    found.add(phrase)
+        return frozenset(found)
+
+    def scan(self, text: Optional[str]) -> Counter:
+        """Number of distinct keywords found per category (shared result, do not mutate)."""
+        found = self.matches(text)
+        if not found:
+            return _EMPTY
+        counts = self._scores.get(found)
+        if counts is None:
+            if len(self._scores) >= self._cache_size:
+                self._scores.clear()
+            counts = self._scores[found] = Counter(
+                name for kw in found for name in self._keyword_categories[kw]
+            )
+        return counts
+
+
+def homework_score(counts: Counter) -> int:
+    """Weighted keyword score: strong hits count double, weak and hint hits once."""
+    return counts["strong"] * 2 + counts["weak"] + counts["hint"]
+
+
+# --- Per-school engines, swapped as a whole on reload ---
+_engines: Dict[Optional[int], KeywordEngine] = {None: KeywordEngine(DEFAULT_KEYWORDS)}
+
+
+def load_keywords(path: str = KEYWORDS_FILE) -> int:
+    """(Re)compile engines from a JSON config and swap them in.
+
+    Format: {"default": {"junk": [...], ...}, "chats": {"<source chat id>": {"homework": [...]}}}.
+    Default lists extend the built-in ones and per-chat lists extend the
+    defaults. Returns the number of per-chat engines.
+    """
+    config = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+    base = {name: list(kws) for name, kws in DEFAULT_KEYWORDS.items()}
+    for name, kws in config.get("default", {}).items():
+        base.setdefault(name, []).extend(kws)
+    engines = {None: KeywordEngine(base)}
+    for chat_id, overrides in config.get("chats", {}).items():
+        merged = {name: list(kws) for name, kws in base.items()}
+        for name, kws in overrides.items():
+            merged.setdefault(name, []).extend(kws)
+        engines[int(chat_id)] = KeywordEngine(merged)
+
+    global _engines
+    _engines = engines
+    logger.info(f"Keyword engines compiled ({len(engines) - 1} per-chat lists)")
+    return len(engines) - 1
+
+
+def get_engine(chat_id: Optional[int] = None) -> KeywordEngine:
+    return _engines.get(chat_id) or _engines[None]
+
+
+def scan_keywords(text: Optional[str], chat_id: Optional[int] = None) -> Counter:
+    return get_engine(chat_id).scan(text)
+
+
+load_keywords()
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import os
 from dotenv import load_dotenv
@@ -10,6 +11,8 @@ from telegram.ext import (
     MessageHandler,
     filters,
 )
+from update_queue import UpdateQueue, POLICY_REJECT
+from route_store import RouteStore
 
 # Load env vars
 load_dotenv()
@@ -24,16 +27,24 @@ logger = logging.getLogger(__name__)
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")
 PORT = int(os.getenv("PORT", 8443))
+# Point the bot at another Bot API server (self-hosted, or a local fake for load tests)
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "")
 ADMIN_CHAT_IDS = list(map(int, os.getenv("ADMIN_CHAT_IDS", "").split(",")))
 
-# ROUTES_MAP from .env in format "123:456,789:1011"
-ROUTES_MAP = {}
-for route in os.getenv("ROUTES_MAP", "").split(","):
-    try:
-        src, dst = map(int, route.strip().split(":"))
-        ROUTES_MAP[src] = dst
-    except ValueError:
-        logger.warning(f"Invalid route format: {route}")
+# Webhook ingestion: "inline" processes each update inside the request,
+# "queue" acknowledges right away and hands the update to background workers.
+WEBHOOK_MODE = os.getenv("WEBHOOK_MODE", "inline").lower()
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", 4))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", 1000))
+UPDATE_QUEUE_POLICY = os.getenv("UPDATE_QUEUE_POLICY", POLICY_REJECT).lower()
+# Media engines (tesseract, whisper): "background" warms them after the server
+# is listening, "blocking" before it, "off" loads them on first use
+MEDIA_WARMUP = os.getenv("MEDIA_WARMUP", "background").lower()
+
+# Routes live in SQLite (ROUTES_DB). An empty store is seeded once from
+# ROUTES_FILE or from ROUTES_MAP in format "123:456,123:457:media,123:458:homework".
+route_store = RouteStore()
+route_store.seed()
 
 # --- Handlers ---
 from handlers import (
@@ -42,6 +53,7 @@ from handlers import (
     status,
     get_id,
     handle_message,
+    prefetch_media,
     list_senders,
     clear_senders,
     list_routes,
@@ -50,31 +62,187 @@ from handlers import (
     weekly_summary,
     clear_homework_log,
     reload_config,
+    profile,
 )
 
-# ✅ utils import (lazy-loading + model warmup)
-from utils import warmup_transcriber
+# ✅ media import (heavy media libraries load lazily, see warmup_media_engines)
+from media import MediaProcessor, warmup_media_engines
+from media.transcriber import BatchTranscriber
+from media_executor import get_media_executor, shutdown_media_executor
+from send_scheduler import SendScheduler
+from media_groups import MediaGroupCollector
+from dedup import UPDATE_WINDOW, DedupCache, UpdateWindow
+from result_cache import ResultCache
+from forward_log import ForwardLog
+from spam_tracker import SpamTracker
+from tracing import PROFILE, TRACE_SLOW_SECONDS, SamplingProfiler, Tracer
+from webhook import WEBHOOK_SECRET, authorized, decoder_name, loads, secret_path, wanted
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    WEBHOOK_PARSE,
+    WEBHOOK_REQUESTS,
+    Gauge,
+    monitor_loop_lag,
+    render as render_metrics,
+)
 
 # --- Init App ---
-application = ApplicationBuilder().token(BOT_TOKEN).build()
+builder = ApplicationBuilder().token(BOT_TOKEN)
+if TELEGRAM_API_BASE_URL:
+    builder = builder.base_url(f"{TELEGRAM_API_BASE_URL.rstrip('/')}/bot")
+    builder = builder.base_file_url(f"{TELEGRAM_API_BASE_URL.rstrip('/')}/file/bot")
+application = builder.build()
+send_scheduler = SendScheduler()
 
-application.bot_data["ROUTES_MAP"] = ROUTES_MAP
+application.bot_data["ROUTE_STORE"] = route_store
 application.bot_data["ADMIN_CHAT_IDS"] = ADMIN_CHAT_IDS
-application.bot_data["FORWARDED_LOGS"] = []
-application.bot_data["SPAM_SENDERS"] = {}
+application.bot_data["FORWARD_LOG"] = forward_log = ForwardLog()
+application.bot_data["SPAM_SENDERS"] = spam_tracker = SpamTracker()
+application.bot_data["PROFILER"] = profiler = SamplingProfiler()
+application.bot_data["SEND_SCHEDULER"] = send_scheduler
+application.bot_data["MEDIA_GROUPS"] = media_groups = MediaGroupCollector()
+application.bot_data["DEDUP"] = dedup_cache = DedupCache()
+# Telegram redelivers updates we answered slowly; their ids are recognised before de_json
+update_window = UpdateWindow() if UPDATE_WINDOW > 0 else None
+application.bot_data["MEDIA"] = media = MediaProcessor(ResultCache(), BatchTranscriber())
+
+# Slow-update tracing wraps process_update here and the handlers once they are registered
+tracer = Tracer() if TRACE_SLOW_SECONDS > 0 else None
+process_update = tracer.wrap_process_update(application.process_update) if tracer else application.process_update
+
+def update_chat_key(update: Update):
+    """Lane key for the update queue: one class group's updates stay in order."""
+    chat = update.effective_chat
+    return chat.id if chat else None
+
+# In queue mode each source chat gets its own ordered lane and different
+# chats run in parallel, at most UPDATE_WORKERS at a time.
+update_queue = None
+if WEBHOOK_MODE == "queue":
+    update_queue = UpdateQueue(
+        process_update,
+        workers=UPDATE_WORKERS,
+        maxsize=UPDATE_QUEUE_SIZE,
+        policy=UPDATE_QUEUE_POLICY,
+        key=update_chat_key,
+    )
 
 # --- Webhook Handler ---
 async def handle_webhook(request):
-    data = await request.json()
-    update = Update.de_json(data, application.bot)
-    await application.process_update(update)
+    # Unauthenticated POSTs are turned away before their body is even read
+    if not authorized(request.headers):
+        WEBHOOK_REQUESTS.inc(outcome="unauthorized")
+        return web.Response(status=401)
+    with WEBHOOK_PARSE.time():
+        try:
+            data = loads(await request.read())
+        except ValueError:
+            WEBHOOK_REQUESTS.inc(outcome="invalid")
+            return web.Response(status=400)
+        if not wanted(data):
+            # Acknowledged so Telegram doesn't redeliver it; no handler would use it
+            WEBHOOK_REQUESTS.inc(outcome="skipped")
+            return web.Response()
+        update_id = data.get("update_id")
+        if update_window is not None and isinstance(update_id, int) and update_window.seen(update_id):
+            logger.info(f"Ignored redelivered update {update_id}")
+            WEBHOOK_REQUESTS.inc(outcome="redelivered")
+            return web.Response()
+        try:
+            update = Update.de_json(data, application.bot)
+        except Exception:
+            # aiohttp answers 500 and Telegram redelivers; let that copy through
+            if update_window is not None and isinstance(update_id, int):
+                update_window.forget(update_id)
+            raise
+    WEBHOOK_REQUESTS.inc(outcome="accepted")
+    if update_queue is None:
+        try:
+            await process_update(update)
+        except Exception:
+            # As above: the redelivered copy must not be dropped as a repeat
+            if update_window is not None:
+                update_window.forget(update.update_id)
+            raise
+        return web.Response()
+
+    if not update_queue.put(update):
+        if update_queue.policy == POLICY_REJECT:
+            # Non-2xx makes Telegram keep the update and redeliver it later
+            logger.warning(f"Update queue full, rejecting update {update.update_id}")
+            if update_window is not None:
+                update_window.forget(update.update_id)
+            return web.Response(status=429, headers={"Retry-After": "1"})
+        logger.warning(f"Update queue full, dropping update {update.update_id}")
+        return web.Response()
+    # Start OCR/transcription while the update waits for its turn in the chat's lane
+    prefetch_media(update, application.bot_data)
     return web.Response()
 
+# What /ready reports: "accepting updates" and "media engines warm" are separate
+readiness = {"accepting_updates": False, "media": "cold"}  # media: cold, warming, warm or failed
+
+async def handle_ready(request):
+    """200 once updates are being processed; /ready/media waits for warm media engines too."""
+    ready = readiness["accepting_updates"]
+    if request.match_info.get("part") == "media":
+        ready = ready and readiness["media"] == "warm"
+    return web.json_response(readiness, status=200 if ready else 503)
+
+async def warm_media():
+    readiness["media"] = "warming"
+    readiness["media"] = "warm" if await warmup_media_engines() else "failed"
+
+async def handle_stats(request):
+    stats = {"mode": WEBHOOK_MODE, "readiness": readiness}
+    if update_queue is not None:
+        stats["update_queue"] = update_queue.stats()
+    stats["media_executor"] = get_media_executor().stats()
+    stats["send_scheduler"] = send_scheduler.stats()
+    stats["dedup"] = dedup_cache.stats()
+    if update_window is not None:
+        stats["update_window"] = update_window.stats()
+    stats["media"] = media.stats()
+    stats["forward_log"] = forward_log.stats()
+    stats["spam"] = spam_tracker.stats()
+    if tracer is not None:
+        stats["tracing"] = tracer.stats()
+    stats["profiler"] = profiler.stats()
+    return web.json_response(stats)
+
+# --- Metrics ---
+def media_queue_depth():
+    executor = get_media_executor()
+    return {("cpu",): executor.pending["cpu"], ("io",): executor.pending["io"]}
+
+Gauge("media_executor_pending", "Media jobs queued or running, per pool", ["pool"], func=media_queue_depth)
+Gauge("update_queue_depth", "Updates waiting in the update queue", func=lambda: update_queue.depth() if update_queue else 0)
+Gauge(
+    "send_queue_depth", "Sends waiting in the per-target send queues",
+    func=lambda: sum(len(target.queue) for target in send_scheduler.targets.values()),
+)
+Gauge("media_warm", "1 once the media engines are warm", func=lambda: int(readiness["media"] == "warm"))
+
+async def handle_metrics(request):
+    return web.Response(body=render_metrics().encode("utf-8"), headers={"Content-Type": METRICS_CONTENT_TYPE})
+
 # --- Startup Logic ---
 async def on_startup(app):
-    logger.info("Running startup model checks...")
-    await warmup_transcriber()
-    logger.info("Startup model checks complete.")
+    if not WEBHOOK_SECRET:
+        logger.warning("WEBHOOK_SECRET is not set: webhook POSTs are not authenticated")
+    logger.info(f"Webhook JSON decoder: {decoder_name()}")
+    await application.initialize()
+    if update_queue is not None:
+        await update_queue.start()
+    app["loop_lag"] = asyncio.ensure_future(monitor_loop_lag())
+    if PROFILE == "on":
+        profiler.start()
+    if MEDIA_WARMUP == "blocking":
+        await warm_media()
+    elif MEDIA_WARMUP == "background":
+        app["media_warmup"] = asyncio.ensure_future(warm_media())
+    readiness["accepting_updates"] = True
+    logger.info(f"Accepting updates (media engines: {readiness['media']})")
     for admin_id in ADMIN_CHAT_IDS:
         try:
             await application.bot.send_message(
@@ -84,6 +252,27 @@ async def on_startup(app):
         except Exception as e:
             logger.warning(f"Failed to notify admin {admin_id}: {e}")
 
+async def on_cleanup(app):
+    readiness["accepting_updates"] = False
+    tasks = [task for task in (app.get("media_warmup"), app.get("loop_lag")) if task is not None]
+    for task in tasks:
+        task.cancel()
+    # Let them unwind before the media executor they may be using is shut down
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if update_queue is not None:
+        await update_queue.stop()
+    profiler.stop()
+    media_groups.flush_all()
+    await media.stop()
+    await send_scheduler.stop()
+    shutdown_media_executor()
+    await application.shutdown()
+    route_store.close()
+    dedup_cache.close()
+    if update_window is not None:
+        update_window.close()
+    forward_log.close()
+
 # --- Register Commands ---
 application.add_handler(CommandHandler("start", start))
 application.add_handler(CommandHandler("help", help_command))
@@ -98,13 +287,23 @@ application.add_handler(CommandHandler("delete_route", delete_route))
 application.add_handler(CommandHandler("weekly_summary", weekly_summary))
 application.add_handler(CommandHandler("clear_homework_log", clear_homework_log))
 application.add_handler(CommandHandler("reload_config", reload_config))
+application.add_handler(CommandHandler("profile", profile))
 
 application.add_handler(MessageHandler(filters.ALL, handle_message))
+if tracer is not None:
+    tracer.wrap_handlers(application)
 
 # --- Run Webhook ---
 app = web.Application()
 app.router.add_post("/", handle_webhook)
+if BOT_TOKEN:
+    app.router.add_post(f"/{secret_path(BOT_TOKEN)}", handle_webhook)  # the path set_webhook.py registers
+app.router.add_get("/stats", handle_stats)
+app.router.add_get("/metrics", handle_metrics)
+app.router.add_get("/ready", handle_ready)
+app.router.add_get("/ready/{part}", handle_ready)
 app.on_startup.append(on_startup)
+app.on_cleanup.append(on_cleanup)
 
 if __name__ == "__main__":
     web.run_app(app, host="0.0.0.0", port=PORT)
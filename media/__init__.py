@@ -0,0 +1,7 @@
+"""Text from media messages: OCR for photos, faster-whisper for voice notes, audio and video.
+
+MediaProcessor is the entry point. numpy, PIL, tesseract and whisper are
+only imported in the media worker processes (or by warmup_media_engines),
+so importing this package keeps startup fast.
+"""
+from media.processor import MediaProcessor, Result, media_kind, warmup_media_engines  # noqa: F401
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import logging
+import subprocess
+import tempfile
+from typing import TYPE_CHECKING, Union
+
+from media.config import FFMPEG_TIMEOUT, MEDIA_MAX_AUDIO_SECONDS, SAMPLE_RATE
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _ffmpeg_decode(source: str, data=None) -> bytes:
+    cmd = [
+        "ffmpeg", "-loglevel", "error", "-i", source,
+        "-t", str(MEDIA_MAX_AUDIO_SECONDS), "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE),
+        "-f", "f32le", "pipe:1",
+    ]
+    result = subprocess.run(
+        cmd,
+        input=data,
+        stdin=None if data is not None else subprocess.DEVNULL,
+        capture_output=True,
+        timeout=FFMPEG_TIMEOUT,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode("utf-8", "replace").strip() or f"ffmpeg exited {result.returncode}")
+    return result.stdout
+
+
+def _needs_seekable_input(data, error: str) -> bool:
+    """MP4/MOV (an "ftyp" box up front) or ffmpeg missing the moov atom: only a seekable file helps."""
+    return bytes(data[4:8]) == b"ftyp" or "moov atom not found" in error
+
+
+def decode_audio(data: Union[bytes, memoryview]) -> np.ndarray:
+    """Decode voice/audio/video bytes to 16 kHz mono float32 samples, ready for whisper.
+
+    The bytes are piped through ffmpeg without touching disk and the output
+    is capped at MEDIA_MAX_AUDIO_SECONDS. MP4s with their index at the end
+    cannot be read from a pipe; only those get one retry through a temp
+    file that is always removed. Returns an empty array on failure.
+    """
+    import numpy as np
+    try:
+        try:
+            raw = _ffmpeg_decode("pipe:0", data)
+        except RuntimeError as e:
+            if not _needs_seekable_input(data, str(e)):
+                raise
+            with tempfile.NamedTemporaryFile() as tmp:
+                tmp.write(data)
+                tmp.flush()
+                raw = _ffmpeg_decode(tmp.name)
+        return np.frombuffer(raw, dtype=np.float32)
+    except Exception as e:
+        logger.error(f"Failed to decode audio: {e}")
+        return np.zeros(0, dtype=np.float32)
@@ -0,0 +1,25 @@
+import os
+from typing import Optional, Tuple
+
+from media.models import spec_for_chat
+
+TESSDATA_PREFIX = os.getenv("TESSDATA_PREFIX", "./tessdata")
+OCR_LANG = os.getenv("OCR_LANG", "dzo+eng")
+# "on": grayscale/downscale/deskew/binarize/crop and script detection first (see media/ocr.py); "off": raw photo
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "on").lower()
+# Per-job memory caps: decoded audio is 16 kHz mono float32, i.e. 64 KB per second
+MEDIA_MAX_DOWNLOAD_BYTES = int(os.getenv("MEDIA_MAX_DOWNLOAD_BYTES", 20 * 1024 * 1024))
+MEDIA_MAX_AUDIO_SECONDS = int(os.getenv("MEDIA_MAX_AUDIO_SECONDS", 600))
+FFMPEG_TIMEOUT = float(os.getenv("FFMPEG_TIMEOUT", 60))
+SAMPLE_RATE = 16000
+# Voice/audio extractions started ahead of their handler at once (about one transcriber batch)
+MEDIA_PREFETCH = int(os.getenv("MEDIA_PREFETCH", 16))
+# Worker processes to keep each configured speech model warm in (0: all media workers)
+STT_WARM_WORKERS = int(os.getenv("STT_WARM_WORKERS", 0))
+
+# (engine, variant) identifying who produced a text, for the result cache
+OCR_ENGINE = ("tesseract", OCR_LANG if OCR_PREPROCESS == "off" else f"{OCR_LANG}/prep")
+
+
+def speech_engine(chat_id: Optional[int] = None) -> Tuple[str, str]:
+    return ("faster-whisper", spec_for_chat(chat_id).variant)
@@ -0,0 +1,183 @@
+import gc
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WHISPER_MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "tiny")
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+# Unload a model this many seconds after its last use (0 keeps models forever)
+STT_MODEL_IDLE_TTL = float(os.getenv("STT_MODEL_IDLE_TTL", 1800))
+
+
+class ModelSpec(NamedTuple):
+    size: str
+    compute_type: str = "int8"
+    language: Optional[str] = None  # None: let whisper detect it
+
+    @property
+    def variant(self) -> str:
+        """Everything that changes the output, for the result cache key."""
+        return f"{self.size}/{self.compute_type}" + (f"@{self.language}" if self.language else "")
+
+
+def parse_spec(text: str) -> ModelSpec:
+    """"size[/compute_type][@language]", e.g. "small/int8@en"."""
+    text, _, language = text.strip().partition("@")
+    size, _, compute_type = text.partition("/")
+    return ModelSpec(size.strip(), compute_type.strip() or WHISPER_COMPUTE_TYPE, language.strip() or None)
+
+
+def parse_profiles(text: str) -> Dict[str, ModelSpec]:
+    """"name=spec,..." -> {name: ModelSpec}; "default" falls back to WHISPER_MODEL_SIZE/COMPUTE_TYPE."""
+    profiles = {"default": ModelSpec(WHISPER_MODEL_SIZE, WHISPER_COMPUTE_TYPE)}
+    for item in filter(None, (p.strip() for p in text.split(","))):
+        name, _, spec = item.partition("=")
+        profiles[name.strip()] = parse_spec(spec)
+    return profiles
+
+
+def parse_route_models(text: str) -> Dict[int, str]:
+    """"source_chat_id:profile,..." -> {source_chat_id: profile}; malformed entries are skipped."""
+    routes = {}
+    for item in filter(None, (p.strip() for p in text.split(","))):
+        chat_id, _, name = item.rpartition(":")
+        try:
+            routes[int(chat_id)] = name.strip()
+        except ValueError:
+            logger.warning(f"Invalid speech model route: {item}")
+    return routes
+
+
+# --- Which model serves which source chat (resolved in the main process) ---
+_profiles: Dict[str, ModelSpec] = {}
+_route_models: Dict[int, str] = {}
+
+
+def load_model_config() -> Dict[str, ModelSpec]:
+    """(Re)read STT_MODELS / STT_ROUTE_MODELS from the environment."""
+    global _profiles, _route_models
+    profiles = parse_profiles(os.getenv("STT_MODELS", ""))
+    route_models = parse_route_models(os.getenv("STT_ROUTE_MODELS", ""))
+    for chat_id, name in route_models.items():
+        if name not in profiles:
+            logger.warning(f"Chat {chat_id} uses unknown speech model profile '{name}', using default")
+    _profiles, _route_models = profiles, route_models
+    return profiles
+
+
+def default_spec() -> ModelSpec:
+    return _profiles["default"]
+
+
+def spec_for_chat(chat_id: Optional[int]) -> ModelSpec:
+    return _profiles.get(_route_models.get(chat_id, "default"), _profiles["default"])
+
+
+def configured_specs() -> List[ModelSpec]:
+    """Distinct models in use by the default profile or some route.
+
+    One spec per size and compute type, as the registry keys models that
+    way (profiles differing only in language share one model).
+    """
+    specs: Dict[Tuple[str, str], ModelSpec] = {}
+    for name in sorted({"default", *_route_models.values()}):
+        if name in _profiles:
+            spec = _profiles[name]
+            specs.setdefault((spec.size, spec.compute_type), spec)
+    return [specs[key] for key in sorted(specs)]
+
+
+class _Loaded:
+    def __init__(self, model):
+        self.model = model
+        self.pipeline = None
+        self.last_used = time.monotonic()
+
+
+class ModelRegistry:
+    """Whisper models of this process, loaded on first use and shared by every caller.
+
+    Models are keyed by size and compute type (the language is a transcribe
+    option, so profiles differing only in language share one instance).
+    With an idle TTL a daemon thread unloads models nobody used for that
+    long and gives their memory back.
+    """
+
+    def __init__(self, idle_ttl: float = STT_MODEL_IDLE_TTL):
+        self.idle_ttl = idle_ttl
+        self._models: Dict[Tuple[str, str], _Loaded] = {}
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+        self.loads = 0
+        self.unloads = 0
+
+    def _entry(self, spec: ModelSpec) -> _Loaded:
+        key = (spec.size, spec.compute_type)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None:
+                from faster_whisper import WhisperModel
+                started = time.perf_counter()
+                entry = self._models[key] = _Loaded(WhisperModel(spec.size, compute_type=spec.compute_type))
+                self.loads += 1
+                logger.info(f"Loaded whisper {spec.size}/{spec.compute_type} in {time.perf_counter() - started:.1f}s")
+                self._start_sweeper()
+            entry.last_used = time.monotonic()
+            return entry
+
+    def model(self, spec: ModelSpec):
+        return self._entry(spec).model
+
+    def pipeline(self, spec: ModelSpec):
+        """BatchedInferencePipeline sharing the model's weights."""
+        entry = self._entry(spec)
+        if entry.pipeline is None:
+            from faster_whisper import BatchedInferencePipeline
+            entry.pipeline = BatchedInferencePipeline(model=entry.model)
+        return entry.pipeline
+
+    def unload_idle(self) -> int:
+        if not self.idle_ttl:
+            return 0
+        cutoff = time.monotonic() - self.idle_ttl
+        with self._lock:
+            idle = [key for key, entry in self._models.items() if entry.last_used < cutoff]
+            for key in idle:
+                del self._models[key]
+                logger.info(f"Unloaded idle whisper {key[0]}/{key[1]}")
+        if idle:
+            self.unloads += len(idle)
+            gc.collect()
+        return len(idle)
+
+    def _start_sweeper(self) -> None:
+        if self.idle_ttl and self._sweeper is None:
+            self._sweeper = threading.Thread(target=self._sweep, name="model-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def _sweep(self) -> None:
+        while True:
+            time.sleep(min(self.idle_ttl, 60))
+            self.unload_idle()
+
+    def loaded(self) -> List[str]:
+        with self._lock:
+            return [f"{size}/{compute_type}" for size, compute_type in self._models]
+
+
+_registry: Optional[ModelRegistry] = None
+
+
+def get_registry() -> ModelRegistry:
+    """This process's registry (each media worker process has its own)."""
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
+
+
+load_model_config()
@@ -0,0 +1,302 @@
+"""OCR pipeline: clean up a phone photo of a worksheet before tesseract sees it.
+
+Stages (each cheap compared to tesseract itself):
+grayscale -> downscale to OCR_TARGET_DPI -> binarize (Otsu, minus solid
+dark surroundings) -> crop to the text region -> deskew -> pick "eng" or
+OCR_LANG from the script.
+Runs in the media worker processes (see media.processor), so numpy/PIL
+stay out of the bot's startup path.
+"""
+import io
+import logging
+import math
+import os
+import time
+from typing import Dict, NamedTuple, Optional, Tuple, Union
+
+# One tesseract per media worker process; don't let each one also spread over every core
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+import numpy as np
+import pytesseract
+from PIL import Image, ImageOps
+
+try:
+    import tesserocr
+except ImportError:  # optional: pytesseract (one tesseract process per image) is the fallback
+    tesserocr = None
+
+from media.config import OCR_LANG, OCR_PREPROCESS
+
+logger = logging.getLogger(__name__)
+
+# Photos are assumed to span roughly one A4 page width
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", 200))
+OCR_PAGE_WIDTH_IN = float(os.getenv("OCR_PAGE_WIDTH_IN", 8.27))
+OCR_DESKEW = int(os.getenv("OCR_DESKEW", 1))
+OCR_MAX_SKEW = float(os.getenv("OCR_MAX_SKEW", 5))  # degrees
+OCR_CROP = int(os.getenv("OCR_CROP", 1))
+# "auto": Latin-only pages are read with "eng" only; "off": always OCR_LANG
+OCR_SCRIPT_DETECT = os.getenv("OCR_SCRIPT_DETECT", "auto").lower()
+# Tibetan script hangs from a headline, so its text lines have one dominant
+# ink row; below this peak/median row-density ratio a page is treated as Latin
+OCR_LATIN_MAX_RATIO = float(os.getenv("OCR_LATIN_MAX_RATIO", 2.5))
+# "auto": resident tesserocr engines when installed, else pytesseract; or force "tesserocr" / "pytesseract"
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto").lower()
+
+
+class PreparedImage(NamedTuple):
+    image: Image.Image
+    lang: str
+    skew: float                       # degrees corrected
+    crop: Optional[Tuple[int, int, int, int]]
+    timings: Dict[str, float]         # stage -> milliseconds
+
+
+def open_image(source: Union[str, bytes, bytearray, Image.Image]) -> Image.Image:
+    if isinstance(source, Image.Image):
+        return source
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    return Image.open(source)
+
+
+def to_grayscale(image: Image.Image) -> Image.Image:
+    # Phones store rotation in EXIF; apply it before anything looks at lines
+    return ImageOps.exif_transpose(image).convert("L")
+
+
+def downscale(gray: Image.Image, target_dpi: int = OCR_TARGET_DPI, page_width_in: float = OCR_PAGE_WIDTH_IN) -> Image.Image:
+    """Shrink (never enlarge) so the page width comes out at about `target_dpi`."""
+    target_width = int(target_dpi * page_width_in)
+    if gray.width <= target_width:
+        return gray
+    height = max(1, round(gray.height * target_width / gray.width))
+    return gray.resize((target_width, height), Image.BILINEAR, reducing_gap=2.0)
+
+
+def otsu_threshold(pixels: np.ndarray) -> int:
+    hist = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight_bg = np.cumsum(hist)
+    weight_fg = weight_bg[-1] - weight_bg
+    sum_bg = np.cumsum(hist * levels)
+    mean_bg = sum_bg / np.maximum(weight_bg, 1)
+    mean_fg = (sum_bg[-1] - sum_bg) / np.maximum(weight_fg, 1)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+
+def ink_mask(gray: Image.Image) -> np.ndarray:
+    """True where a pixel is darker than the Otsu threshold."""
+    pixels = np.asarray(gray, dtype=np.uint8)
+    return pixels <= otsu_threshold(pixels)
+
+
+def _box_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum of `values` in the `window` x `window` box around each cell (edges replicated)."""
+    half = window // 2
+    padded = np.pad(values, half + 1, mode="edge")
+    integral = padded.cumsum(axis=0).cumsum(axis=1)
+    sums = (
+        integral[window:, window:] - integral[:-window, window:]
+        - integral[window:, :-window] + integral[:-window, :-window]
+    )
+    return sums[:values.shape[0], :values.shape[1]]
+
+
+def text_ink(ink: np.ndarray, window: int = 24, cell: int = 4) -> np.ndarray:
+    """Ink minus solid dark areas (table, hand, shadow around the sheet) and their rims.
+
+    Strokes are thin, so inside any `window`-sized box text covers well
+    under 60% of the pixels; boxes above that are solid, and ink within one
+    window of a solid area is dropped too. Works on `cell` x `cell` blocks
+    to stay cheap.
+    """
+    height, width = ink.shape
+    rows, cols = -(-height // cell), -(-width // cell)
+    blocks = np.zeros((rows * cell, cols * cell), dtype=np.float32)
+    blocks[:height, :width] = ink
+    density = blocks.reshape(rows, cell, cols, cell).mean(axis=(1, 3))
+    span = max(1, window // cell)
+    solid = _box_sum(density, span) >= 0.6 * span * span
+    if not solid.any():
+        return ink
+    near_solid = _box_sum(solid.astype(np.float32), span) > 0
+    near_solid = np.repeat(np.repeat(near_solid, cell, axis=0), cell, axis=1)[:height, :width]
+    return ink & ~near_solid
+
+
+def estimate_skew(ink: np.ndarray, max_angle: float = OCR_MAX_SKEW, step: float = 0.25) -> float:
+    """Angle (degrees) that makes text rows sharpest in the horizontal projection profile."""
+    factor = max(1, ink.shape[1] // 500)
+    ys, xs = np.nonzero(ink[::factor, ::factor])
+    if len(ys) < 100:
+        return 0.0
+    if len(ys) > 200_000:
+        keep = np.random.default_rng(0).choice(len(ys), 200_000, replace=False)
+        ys, xs = ys[keep], xs[keep]
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + step / 2, step):
+        rows = np.round(ys - xs * math.tan(math.radians(angle))).astype(np.int64)
+        hist = np.bincount(rows - rows.min()).astype(np.float64)
+        score = float(np.dot(hist, hist))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def text_region(ink: np.ndarray, margin: float = 0.02) -> Optional[Tuple[int, int, int, int]]:
+    """Bounding box (left, top, right, bottom) of the rows/columns holding text ink.
+
+    Expects `text_ink` output (solid surroundings already removed). Returns
+    None when the box would not save much.
+    """
+    height, width = ink.shape
+
+    def span(density):
+        textish = np.nonzero(density > 0.002)[0]
+        if not len(textish):
+            return None
+        return int(textish[0]), int(textish[-1]) + 1
+
+    rows, cols = span(ink.mean(axis=1)), span(ink.mean(axis=0))
+    if rows is None or cols is None:
+        return None
+    pad_y, pad_x = int(height * margin), int(width * margin)
+    box = (max(0, cols[0] - pad_x), max(0, rows[0] - pad_y), min(width, cols[1] + pad_x), min(height, rows[1] + pad_y))
+    if (box[2] - box[0]) * (box[3] - box[1]) > 0.9 * width * height:
+        return None
+    return box
+
+
+def headline_ratio(ink: np.ndarray) -> Optional[float]:
+    """Median over text lines of (densest ink row / median ink row); None without text lines.
+
+    Latin lines are busiest over the whole x-height band (ratio ~1.5);
+    Tibetan letters hang from a continuous headline that stands out well
+    above the rest of the line.
+    """
+    density = ink.mean(axis=1)
+    on = density > max(0.01, density.max() * 0.05)
+    ratios = []
+    start = None
+    for y, is_text in enumerate(np.append(on, False)):
+        if is_text and start is None:
+            start = y
+        elif not is_text and start is not None:
+            line = density[start:y]
+            if len(line) >= 5 and np.median(line) > 0:
+                ratios.append(line.max() / np.median(line))
+            start = None
+    return float(np.median(ratios)) if ratios else None
+
+
+def detect_lang(ink: np.ndarray, default: str = OCR_LANG) -> str:
+    if OCR_SCRIPT_DETECT != "auto" or default == "eng":
+        return default
+    ratio = headline_ratio(ink)
+    return "eng" if ratio is not None and ratio < OCR_LATIN_MAX_RATIO else default
+
+
+def preprocess(image: Image.Image) -> PreparedImage:
+    timings = {}
+    started = time.perf_counter()
+
+    def mark(stage):
+        nonlocal started
+        now = time.perf_counter()
+        timings[stage] = round((now - started) * 1000, 2)
+        started = now
+
+    gray = to_grayscale(image)
+    mark("grayscale")
+    gray = downscale(gray)
+    mark("downscale")
+    ink = text_ink(ink_mask(gray))
+    mark("binarize")
+    box = text_region(ink) if OCR_CROP else None
+    if box is not None:
+        gray, ink = gray.crop(box), ink[box[1]:box[3], box[0]:box[2]]
+    mark("crop")
+    skew = 0.0
+    if OCR_DESKEW:
+        skew = estimate_skew(ink)
+        if abs(skew) >= 0.25:
+            gray = gray.rotate(skew, resample=Image.BILINEAR, expand=True, fillcolor=255)
+            ink = text_ink(ink_mask(gray))
+    mark("deskew")
+    lang = detect_lang(ink)
+    mark("script")
+    binary = Image.fromarray(np.where(ink, 0, 255).astype(np.uint8))
+    return PreparedImage(binary, lang, skew, box, timings)
+
+
+# --- Tesseract backends ---
+_engines: Dict[str, "tesserocr.PyTessBaseAPI"] = {}  # lang -> engine resident in this process
+
+
+def backend_name(backend: Optional[str] = None) -> str:
+    backend = (backend or OCR_BACKEND).lower()
+    if backend == "auto":
+        return "tesserocr" if tesserocr is not None else "pytesseract"
+    return backend
+
+
+def _engine(lang: str):
+    """Engine for `lang`, created once per process so the traineddata is parsed once."""
+    engine = _engines.get(lang)
+    if engine is None:
+        tessdata = os.getenv("TESSDATA_PREFIX")
+        kwargs = {"path": tessdata} if tessdata else {}
+        engine = _engines[lang] = tesserocr.PyTessBaseAPI(lang=lang, **kwargs)
+        logger.info(f"Tesseract engine loaded for {lang}")
+    return engine
+
+
+def recognise(image: Image.Image, lang: str, backend: Optional[str] = None) -> str:
+    if backend_name(backend) == "tesserocr" and tesserocr is not None:
+        try:
+            engine = _engine(lang)
+        except RuntimeError as e:
+            logger.error(f"tesserocr could not load {lang}, using pytesseract: {e}")
+        else:
+            engine.SetImage(image)
+            try:
+                return engine.GetUTF8Text()
+            finally:
+                engine.Clear()
+    return pytesseract.image_to_string(image, lang=lang)
+
+
+def preload(langs=None, backend: Optional[str] = None) -> str:
+    """Load engines for the languages this bot reads (run in each media worker at warmup)."""
+    if backend_name(backend) == "tesserocr" and tesserocr is not None:
+        for lang in langs or {OCR_LANG, "eng"}:
+            try:
+                _engine(lang)
+            except RuntimeError as e:
+                logger.error(f"tesserocr could not load {lang}: {e}")
+    return backend_name(backend)
+
+
+def read(source: Union[str, bytes, bytearray, Image.Image], backend: Optional[str] = None) -> Tuple[str, Dict[str, float]]:
+    """Text of an image plus stage timings in ms (preprocessing stages, then "tesseract")."""
+    image = open_image(source)
+    if OCR_PREPROCESS == "off":
+        prepared = PreparedImage(image, OCR_LANG, 0.0, None, {})
+    else:
+        prepared = preprocess(image)
+    started = time.perf_counter()
+    text = recognise(prepared.image, prepared.lang, backend).strip()
+    timings = dict(prepared.timings, tesseract=round((time.perf_counter() - started) * 1000, 2))
+    return text, timings
+
+
+def extract_text_from_image(source: Union[str, bytes, bytearray, Image.Image], backend: Optional[str] = None) -> str:
+    """Extract text from an image path, image bytes or PIL image using Tesseract OCR"""
+    try:
+        return read(source, backend)[0]
+    except Exception as e:
+        logger.error(f"OCR failed: {e}")
+        return ""
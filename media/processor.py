@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from telegram import Message
+
+from dedup import media_unique_id
+from media.audio import decode_audio
+from media.config import MEDIA_MAX_DOWNLOAD_BYTES, MEDIA_PREFETCH, OCR_ENGINE, STT_WARM_WORKERS, speech_engine
+from media.models import ModelSpec, configured_specs, get_registry, spec_for_chat
+from media.speech import transcribe_audio
+from media_executor import get_media_executor
+from metrics import STAGE_SECONDS
+from tracing import add_timings, annotate
+
+logger = logging.getLogger(__name__)
+
+# Message attribute -> pipeline; anything else has no text to extract
+MEDIA_KINDS = {"photo": "ocr", "voice": "speech", "audio": "speech", "video": "speech"}
+# Only speech gains from starting early (the transcriber batches it); photos wait for their handler
+PREFETCH_KINDS = ("voice", "audio")
+# Prefetched results not yet claimed by their handler; the oldest are cancelled past this
+PREFETCH_MAX = 1000
+
+
+class Result(NamedTuple):
+    text: str
+    kind: Optional[str]               # "photo", "voice", "audio", "video"; None without media
+    engine: Optional[str]
+    variant: Optional[str]
+    cached: bool
+    timings: Dict[str, float]         # stage -> milliseconds
+
+
+def media_kind(message: Message) -> Optional[str]:
+    for kind in MEDIA_KINDS:
+        if getattr(message, kind):
+            return kind
+    return None
+
+
+def _ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+# --- Engines (these run in the media worker processes) ---
+def run_ocr(data: bytes) -> Tuple[str, Dict[str, float]]:
+    """OCR image bytes; returns the text and the pipeline's stage timings ("" on failure)."""
+    from media import ocr
+    try:
+        return ocr.read(data)
+    except Exception as e:
+        logger.error(f"OCR failed: {e}")
+        return "", {}
+
+
+def import_media_engines() -> bool:
+    """Import the heavy media libraries in the current process."""
+    import numpy  # noqa: F401
+    import faster_whisper  # noqa: F401
+    from media import ocr  # noqa: F401  (PIL, pytesseract)
+    return True
+
+
+def preload_media_engines(specs: List[ModelSpec]) -> List[str]:
+    """Import the media libraries, start tesseract engines and load the given whisper models in the current (worker) process."""
+    import_media_engines()
+    from media import ocr
+    ocr.preload()
+    registry = get_registry()
+    for spec in specs:
+        registry.pipeline(spec)
+    return registry.loaded()
+
+
+async def warmup_media_engines() -> bool:
+    """Pre-load exactly the configured speech models in the warm pool of media workers.
+
+    Also imports the media libraries in this process (for the in-process
+    ffmpeg/numpy decoding). Returns False if anything failed; the engines
+    then load lazily on first use instead.
+    """
+    executor = get_media_executor()
+    try:
+        specs = configured_specs()
+        await executor.run_io(import_media_engines)
+        await executor.warmup(preload_media_engines, specs, workers=STT_WARM_WORKERS or None)
+        logger.info(f"Media engines warm (speech models: {', '.join(spec.variant for spec in specs)})")
+        return True
+    except Exception as e:
+        logger.error(f"Media engine warmup failed: {e}")
+        return False
+
+
+class MediaProcessor:
+    """The one way to get text out of a media message.
+
+    Photos go through OCR, voice notes, audio and video through whisper
+    (batched by the transcriber when there is one). Media is downloaded
+    into memory, results are cached per file and engine variant, and each
+    Result carries per-stage timings in ms; stats() aggregates them.
+
+    prefetch() starts an extraction while the update still waits in its
+    chat's lane of the update queue: a burst of voice notes from one class
+    then reaches the transcriber together and is batched, while the
+    handler still consumes the texts (and orders the sends) one by one.
+    At most `prefetch_limit` prefetches download and decode at once;
+    past that, the handler extracts the text itself when its turn comes.
+    """
+
+    def __init__(self, results=None, transcriber=None, prefetch_limit: int = MEDIA_PREFETCH):
+        self.results = results          # ResultCache
+        self.transcriber = transcriber  # BatchTranscriber
+        self._pipelines = {"ocr": self._ocr, "speech": self._speech}
+        self.extractions: Dict[str, int] = {}
+        self.cache_hits = 0
+        self.empty = 0
+        self._stages: Dict[str, List[float]] = {}  # stage -> [count, total ms, max ms]
+        self._prefetched: "OrderedDict[Tuple[int, int], asyncio.Task]" = OrderedDict()
+        self.prefetch_limit = prefetch_limit
+        self.prefetching = 0
+        self.prefetches = 0
+
+    @staticmethod
+    def engine(kind: str, chat_id: Optional[int] = None) -> Tuple[str, str]:
+        """(engine, variant) that reads `kind` media from `chat_id`."""
+        return OCR_ENGINE if MEDIA_KINDS[kind] == "ocr" else speech_engine(chat_id)
+
+    def prefetch(self, message: Message) -> None:
+        """Start extracting the text of `message` now; extract_text() picks up the result."""
+        key = (message.chat_id, message.message_id)
+        if key in self._prefetched or self.prefetching >= self.prefetch_limit:
+            return
+        if media_kind(message) not in PREFETCH_KINDS:
+            return
+        task = asyncio.ensure_future(self._extract(message))
+        task.add_done_callback(self._prefetch_done)
+        self._prefetched[key] = task
+        self.prefetching += 1
+        self.prefetches += 1
+        while len(self._prefetched) > PREFETCH_MAX:
+            self._prefetched.popitem(last=False)[1].cancel()
+
+    def _prefetch_done(self, task: asyncio.Task) -> None:
+        self.prefetching -= 1
+
+    async def extract_text(self, message: Message) -> Result:
+        task = self._prefetched.pop((message.chat_id, message.message_id), None)
+        result = await task if task is not None else await self._extract(message)
+        if result.kind is not None:
+            # Attached here rather than in _extract: a prefetch runs outside the update's trace
+            annotate(media=result.kind, cached=result.cached)
+            add_timings(result.timings, prefix="media.")
+        return result
+
+    async def _extract(self, message: Message) -> Result:
+        kind = media_kind(message)
+        if kind is None:
+            return Result("", None, None, None, False, {})
+        engine, variant = self.engine(kind, message.chat_id)
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        file_id = media_unique_id(message)
+        if self.results is not None:
+            cached = self.results.get(file_id, engine, variant)
+            if cached is not None:
+                timings["cache"] = _ms(started)
+                return self._record(Result(cached, kind, engine, variant, True, timings))
+
+        text = ""
+        try:
+            buffer = await self._download(message, kind, timings)
+            if buffer is not None:
+                text = await self._pipelines[MEDIA_KINDS[kind]](message, buffer, timings)
+        except asyncio.TimeoutError:
+            logger.error(f"Text extraction from {kind} timed out")
+        except Exception as e:
+            logger.error(f"Failed to extract text from {kind}: {e}")
+        # Empty output is usually a failed download or a timeout; don't pin it
+        if self.results is not None and text:
+            self.results.put(file_id, engine, variant, text)
+        timings["total"] = _ms(started)
+        return self._record(Result(text, kind, engine, variant, False, timings))
+
+    async def _download(self, message: Message, kind: str, timings: Dict[str, float]) -> Optional[io.BytesIO]:
+        """Download into memory, never to disk; None if the file is over MEDIA_MAX_DOWNLOAD_BYTES."""
+        media = message.photo[-1] if kind == "photo" else getattr(message, kind)
+        if media.file_size and media.file_size > MEDIA_MAX_DOWNLOAD_BYTES:
+            logger.warning(f"Skipped {media.file_size} byte media from {message.chat_id}: over MEDIA_MAX_DOWNLOAD_BYTES")
+            return None
+        started = time.perf_counter()
+        file = await media.get_file()
+        buffer = io.BytesIO()
+        await file.download_to_memory(buffer)
+        timings["download"] = _ms(started)
+        annotate(media_bytes=buffer.getbuffer().nbytes)
+        return buffer
+
+    async def _ocr(self, message: Message, buffer: io.BytesIO, timings: Dict[str, float]) -> str:
+        started = time.perf_counter()
+        text, stages = await get_media_executor().run_cpu(run_ocr, buffer.getvalue())
+        # Stages as measured inside the worker; "ocr" also counts queueing and transfer
+        timings.update(stages)
+        timings["ocr"] = _ms(started)
+        return text
+
+    async def _speech(self, message: Message, buffer: io.BytesIO, timings: Dict[str, float]) -> str:
+        started = time.perf_counter()
+        # ffmpeg runs as a subprocess, so a thread is enough and the buffer is shared, not copied
+        samples = await get_media_executor().run_io(decode_audio, buffer.getbuffer())
+        timings["decode"] = _ms(started)
+        if not samples.size:
+            return ""
+        started = time.perf_counter()
+        if self.transcriber is not None:
+            # Voice notes arriving together share one batched whisper pass
+            text = await self.transcriber.transcribe(samples, message.chat_id)
+        else:
+            text = await get_media_executor().run_cpu(transcribe_audio, samples, spec_for_chat(message.chat_id))
+        timings["transcribe"] = _ms(started)
+        return text
+
+    def _record(self, result: Result) -> Result:
+        self.extractions[result.kind] = self.extractions.get(result.kind, 0) + 1
+        self.cache_hits += result.cached
+        self.empty += not result.text
+        for stage, ms in result.timings.items():
+            STAGE_SECONDS.observe(ms / 1000, stage=stage, media=result.kind)
+            totals = self._stages.setdefault(stage, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += ms
+            totals[2] = max(totals[2], ms)
+        return result
+
+    async def stop(self) -> None:
+        """Drop unclaimed prefetches, transcribe whatever is still queued, then close the result cache."""
+        for task in self._prefetched.values():
+            task.cancel()
+        self._prefetched.clear()
+        if self.transcriber is not None:
+            await self.transcriber.stop()
+        if self.results is not None:
+            self.results.close()
+
+    def stats(self) -> dict:
+        stats = {
+            "extractions": dict(self.extractions),
+            "cache_hits": self.cache_hits,
+            "empty": self.empty,
+            "prefetches": self.prefetches,
+            "prefetching": self.prefetching,
+            "stages_ms": {
+                stage: {"count": count, "avg": round(total / count, 2), "max": round(peak, 2)}
+                for stage, (count, total, peak) in self._stages.items()
+            },
+        }
+        if self.results is not None:
+            stats["result_cache"] = self.results.stats()
+        if self.transcriber is not None:
+            stats["transcriber"] = self.transcriber.stats()
+        return stats
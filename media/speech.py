@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import bisect
+import logging
+from typing import TYPE_CHECKING, List, Optional, Union
+
+from media.config import SAMPLE_RATE
+from media.models import ModelSpec, default_spec, get_registry
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def transcribe_audio(audio: Union[str, np.ndarray], spec: Optional[ModelSpec] = None) -> str:
+    """Convert an audio file or 16 kHz mono float32 samples to text using faster-whisper."""
+    try:
+        spec = spec or default_spec()
+        model = get_registry().model(spec)
+        segments, _ = model.transcribe(audio, language=spec.language)
+        return " ".join([seg.text.strip() for seg in segments if seg.text]).strip()
+    except Exception as e:
+        logger.error(f"Audio transcription failed: {e}")
+        return ""
+
+
+def transcribe_batch(clips: List[np.ndarray], batch_size: int = 8, spec: Optional[ModelSpec] = None) -> List[str]:
+    """Transcribe several 16 kHz clips with one batched whisper pass.
+
+    faster-whisper only batches the speech chunks of a single audio array,
+    so the clips are concatenated and VAD runs per clip; the resulting
+    chunk boundaries (passed as clip_timestamps) never cross from one clip
+    into the next, silence is skipped, and each segment maps back to its
+    clip by position.
+    """
+    try:
+        import numpy as np
+        from faster_whisper.vad import VadOptions, get_speech_timestamps, merge_segments
+        spec = spec or default_spec()
+        pipeline = get_registry().pipeline(spec)
+        vad = VadOptions(max_speech_duration_s=30, min_silence_duration_ms=160)
+        offsets, chunks, position = [], [], 0
+        for clip in clips:
+            offsets.append(position)
+            for chunk in merge_segments(get_speech_timestamps(clip, vad), vad):
+                chunks.append({"start": chunk["start"] + position, "end": chunk["end"] + position})
+            position += len(clip)
+        texts = [[] for _ in clips]
+        if chunks:
+            segments, _ = pipeline.transcribe(
+                np.concatenate(clips),
+                clip_timestamps=chunks,
+                batch_size=batch_size,
+                language=spec.language,
+                # Without a fixed language, detect it per chunk rather than once for the batch
+                multilingual=spec.language is None and pipeline.model.model.is_multilingual,
+            )
+            for segment in segments:
+                middle = (segment.start + segment.end) / 2 * SAMPLE_RATE
+                texts[bisect.bisect_right(offsets, middle) - 1].append(segment.text.strip())
+        return [" ".join(t for t in parts if t) for parts in texts]
+    except Exception as e:
+        logger.error(f"Batched transcription failed: {e}")
+        return [""] * len(clips)
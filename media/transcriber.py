@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from media.config import SAMPLE_RATE
+from media.models import ModelSpec, spec_for_chat
+from media.speech import transcribe_batch
+from media_executor import get_media_executor
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# How long the first clip of a batch waits for company (seconds)
+STT_BATCH_WINDOW = float(os.getenv("STT_BATCH_WINDOW", 0.5))
+STT_BATCH_MAX_CLIPS = int(os.getenv("STT_BATCH_MAX_CLIPS", 16))
+# Speech chunks per whisper forward pass
+STT_BATCH_SIZE = int(os.getenv("STT_BATCH_SIZE", 8))
+
+
+class BatchTranscriber:
+    """Collects voice notes for a short window and transcribes them in one batched pass.
+
+    Clips are batched per speech model (see media.models: routes can use
+    different models). A batch goes out STT_BATCH_WINDOW seconds after its
+    first clip arrived or as soon as it holds STT_BATCH_MAX_CLIPS clips;
+    each caller gets its own text back. Batches run in the media process
+    pool, so several can be in flight at once.
+    """
+
+    def __init__(
+        self,
+        window: float = STT_BATCH_WINDOW,
+        max_clips: int = STT_BATCH_MAX_CLIPS,
+        batch_size: int = STT_BATCH_SIZE,
+    ):
+        self.window = window
+        self.max_clips = max(1, max_clips)
+        self.batch_size = max(1, batch_size)
+        self._pending: Dict[ModelSpec, List[Tuple[np.ndarray, asyncio.Future]]] = {}
+        self._timers: Dict[ModelSpec, asyncio.TimerHandle] = {}
+        self._tasks = set()
+        self.clips = 0
+        self.batches = 0
+        self.audio_seconds = 0.0
+        self._active = 0
+        self._busy_since = 0.0
+        self.busy_seconds = 0.0
+
+    async def transcribe(self, samples: np.ndarray, chat_id: Optional[int] = None) -> str:
+        """Queue 16 kHz mono float32 samples from `chat_id` and wait for their text ("" on failure)."""
+        spec = spec_for_chat(chat_id)
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending.setdefault(spec, [])
+        pending.append((samples, future))
+        if len(pending) >= self.max_clips:
+            self._flush(spec)
+        elif spec not in self._timers:
+            self._timers[spec] = asyncio.get_running_loop().call_later(self.window, self._flush, spec)
+        return await future
+
+    def _flush(self, spec: ModelSpec) -> None:
+        timer = self._timers.pop(spec, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(spec, None)
+        if batch:
+            task = asyncio.ensure_future(self._run(spec, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, spec: ModelSpec, batch: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        clips = [samples for samples, _ in batch]
+        if self._active == 0:
+            self._busy_since = time.perf_counter()
+        self._active += 1
+        try:
+            texts = await get_media_executor().run_cpu(transcribe_batch, clips, self.batch_size, spec)
+        except asyncio.TimeoutError:
+            logger.error(f"Batch of {len(clips)} clips timed out")
+            texts = [""] * len(clips)
+        except Exception as e:
+            logger.error(f"Batch of {len(clips)} clips failed: {e}")
+            texts = [""] * len(clips)
+        finally:
+            self._active -= 1
+            if self._active == 0:
+                self.busy_seconds += time.perf_counter() - self._busy_since
+        self.clips += len(clips)
+        self.batches += 1
+        self.audio_seconds += sum(len(c) for c in clips) / SAMPLE_RATE
+        for (_, future), text in zip(batch, texts):
+            if not future.done():
+                future.set_result(text)
+
+    async def stop(self) -> None:
+        """Transcribe whatever is still waiting and let running batches finish."""
+        for spec in list(self._pending):
+            self._flush(spec)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "pending": sum(len(batch) for batch in self._pending.values()),
+            "in_flight": self._active,
+            "clips": self.clips,
+            "batches": self.batches,
+            "avg_batch": round(self.clips / self.batches, 2) if self.batches else 0,
+            "audio_seconds": round(self.audio_seconds, 1),
+            # audio seconds transcribed per second of wall time spent transcribing
+            "realtime_factor": round(self.audio_seconds / self.busy_seconds, 2) if self.busy_seconds else 0,
+        }
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Keep one core free for the aiohttp event loop by default
+_CPU_COUNT = os.cpu_count() or 2
+MEDIA_CPU_WORKERS = int(os.getenv("MEDIA_CPU_WORKERS", max(1, _CPU_COUNT - 1)))
+MEDIA_IO_WORKERS = int(os.getenv("MEDIA_IO_WORKERS", min(32, _CPU_COUNT * 2)))
+MEDIA_JOB_TIMEOUT = float(os.getenv("MEDIA_JOB_TIMEOUT", 120))
+MEDIA_MP_START = os.getenv("MEDIA_MP_START", "")  # "fork", "spawn", "forkserver" or platform default
+
+
+def _warm_own_worker(barrier: threading.Barrier, timeout: float, func: Callable, *args):
+    """Hold this worker until every warmup job has one of its own, then run `func`."""
+    barrier.wait(timeout)
+    return func(*args)
+
+
+class MediaExecutor:
+    """Runs heavy media work off the event loop.
+
+    CPU-bound jobs (tesseract, whisper) go to a process pool so they do not
+    hold the GIL; subprocess/file I/O jobs (ffmpeg) go to a thread pool.
+    Every job has a timeout and can be cancelled while queued.
+    """
+
+    def __init__(
+        self,
+        cpu_workers: int = MEDIA_CPU_WORKERS,
+        io_workers: int = MEDIA_IO_WORKERS,
+        timeout: float = MEDIA_JOB_TIMEOUT,
+    ):
+        self.cpu_workers = max(1, cpu_workers)
+        self.io_workers = max(1, io_workers)
+        self.timeout = timeout
+        self._cpu_pool: Optional[ProcessPoolExecutor] = None
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self.pending = {"cpu": 0, "io": 0}
+        self.completed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+
+    def _context(self):
+        return multiprocessing.get_context(MEDIA_MP_START or None)
+
+    def _cpu(self) -> ProcessPoolExecutor:
+        if self._cpu_pool is None:
+            self._cpu_pool = ProcessPoolExecutor(max_workers=self.cpu_workers, mp_context=self._context())
+        return self._cpu_pool
+
+    def _io(self) -> ThreadPoolExecutor:
+        if self._io_pool is None:
+            self._io_pool = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="media-io")
+        return self._io_pool
+
+    async def _run(self, kind: str, func: Callable, *args, timeout: Optional[float] = None):
+        pool = self._cpu() if kind == "cpu" else self._io()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(pool, func, *args)
+        self.pending[kind] += 1
+        try:
+            # wait_for cancels the pool future, so a job still in the queue never starts
+            result = await asyncio.wait_for(future, timeout=timeout or self.timeout)
+            self.completed += 1
+            return result
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.pending[kind] -= 1
+
+    async def run_cpu(self, func: Callable, *args, timeout: Optional[float] = None):
+        """Run a picklable, module-level function in the process pool."""
+        return await self._run("cpu", func, *args, timeout=timeout)
+
+    async def run_io(self, func: Callable, *args, timeout: Optional[float] = None):
+        """Run a blocking I/O or subprocess-bound function in the thread pool."""
+        return await self._run("io", func, *args, timeout=timeout)
+
+    async def warmup(self, func: Callable, *args, workers: Optional[int] = None) -> list:
+        """Run `func(*args)` once in each CPU worker (or in `workers` of them) so those processes load models up front.
+
+        The pool gives no say over which process takes a job, so each job
+        first waits on a shared barrier: none can start until every one
+        holds a worker of its own. If the workers are busy with other jobs
+        for longer than the job timeout the barrier breaks and this raises.
+        """
+        count = min(workers or self.cpu_workers, self.cpu_workers)
+        if count == 1:
+            return [await self.run_cpu(func, *args)]
+        manager = self._context().Manager()
+        try:
+            barrier = manager.Barrier(count)
+            return await asyncio.gather(
+                *(self.run_cpu(_warm_own_worker, barrier, self.timeout, func, *args) for _ in range(count))
+            )
+        finally:
+            manager.shutdown()
+
+    def shutdown(self, wait: bool = False) -> None:
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=wait, cancel_futures=True)
+            self._cpu_pool = None
+        if self._io_pool is not None:
+            self._io_pool.shutdown(wait=wait, cancel_futures=True)
+            self._io_pool = None
+
+    def stats(self) -> dict:
+        return {
+            "cpu_workers": self.cpu_workers,
+            "io_workers": self.io_workers,
+            "pending_cpu": self.pending["cpu"],
+            "pending_io": self.pending["io"],
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+        }
+
+
+_executor: Optional[MediaExecutor] = None
+
+
+def get_media_executor() -> MediaExecutor:
+    """Shared executor, created on first use."""
+    global _executor
+    if _executor is None:
+        _executor = MediaExecutor()
+    return _executor
+
+
+def shutdown_media_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import os
+from typing import Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+# How long to wait for more album siblings after the last one arrived (seconds)
+ALBUM_WINDOW = float(os.getenv("ALBUM_WINDOW", 1.0))
+ALBUM_MAX_SIZE = 10  # Telegram's limit for one media group
+
+
+class _PendingGroup:
+    def __init__(self, flush: Callable[[list], asyncio.Future]):
+        self.messages = []
+        self.flush = flush
+        self.future = asyncio.get_running_loop().create_future()
+        # Failures are logged where the send happens; mark them retrieved here
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.timer = None
+
+
+class MediaGroupCollector:
+    """Buffers album siblings (same media_group_id) so each album goes out in one send.
+
+    A group is flushed ALBUM_WINDOW seconds after its last sibling arrived,
+    as soon as it reaches Telegram's 10 item limit, or when the source chat
+    sends something else to the same target (so the album stays ahead of
+    the follow-up message).
+    """
+
+    def __init__(self, window: float = ALBUM_WINDOW, max_size: int = ALBUM_MAX_SIZE):
+        self.window = window
+        self.max_size = max_size
+        self._pending = {}  # (source chat, media_group_id, target) -> _PendingGroup
+
+    def add(self, key: Hashable, message, flush: Callable[[list], asyncio.Future]) -> asyncio.Future:
+        """Add one album item; `flush(messages)` is called once for the whole group."""
+        group = self._pending.get(key)
+        if group is None:
+            group = self._pending[key] = _PendingGroup(flush)
+        group.messages.append(message)
+        if group.timer is not None:
+            group.timer.cancel()
+        if len(group.messages) >= self.max_size:
+            self._flush(key)
+        else:
+            group.timer = asyncio.get_running_loop().call_later(self.window, self._flush, key)
+        return group.future
+
+    def flush(self, source_chat_id: int, target_chat_id: int) -> None:
+        """Send any album still being collected from this source to this target."""
+        for key in [k for k in self._pending if k[0] == source_chat_id and k[2] == target_chat_id]:
+            self._flush(key)
+
+    def flush_all(self) -> None:
+        for key in list(self._pending):
+            self._flush(key)
+
+    def _flush(self, key: Hashable) -> None:
+        group = self._pending.pop(key, None)
+        if group is None:
+            return
+        if group.timer is not None:
+            group.timer.cancel()
+        try:
+            sent = group.flush(group.messages)
+        except Exception as e:
+            logger.error(f"Failed to send media group {key}: {e}")
+            group.future.set_exception(e)
+            return
+        sent.add_done_callback(lambda f: _chain(f, group.future))
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+
+def _chain(source: asyncio.Future, target: asyncio.Future) -> None:
+    if target.done():
+        return
+    if source.cancelled():
+        target.cancel()
+    elif source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
@@ -0,0 +1,180 @@
+"""Counters, gauges and latency histograms, exported in the Prometheus text format on /metrics.
+
+A few dozen lines instead of a client library: the bot runs as one
+process, so metrics are plain dicts updated on the event loop and
+rendered on scrape.
+"""
+import asyncio
+import bisect
+import logging
+import math
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRICS_PREFIX = os.getenv("METRICS_PREFIX", "homework_bot")
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", 0.5))  # seconds between event-loop lag probes
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers a 5 ms classification up to a multi-minute transcription
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, "_Metric"] = {}
+
+    def register(self, metric: "_Metric") -> None:
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.error(f"Failed to collect {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), registry: Registry = REGISTRY):
+        self.name = f"{METRICS_PREFIX}_{name}"
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        registry.register(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in self._values.items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Set directly, or computed on every scrape by `func` (a number, or {label values: number})."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), func: Optional[Callable] = None, **kwargs):
+        super().__init__(name, help, labels, **kwargs)
+        self.func = func
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def samples(self) -> List[str]:
+        if self.func is not None:
+            value = self.func()
+            self._values = value if isinstance(value, dict) else {(): value}
+        return super().samples()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(name, help, labels, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]  # per-bucket counts, sum, count
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+
+# --- What the bot measures ---
+WEBHOOK_PARSE = Histogram("webhook_parse_seconds", "JSON decoding and Update.de_json of a webhook request")
+WEBHOOK_REQUESTS = Counter(
+    "webhook_requests_total",
+    "Webhook POSTs: accepted, unauthorized, invalid, skipped (unhandled type) or redelivered (update_id seen before)",
+    ["outcome"],
+)
+UPDATE_QUEUE_WAIT = Histogram("update_queue_wait_seconds", "Time an update waited in the update queue")
+STAGE_SECONDS = Histogram(
+    "stage_seconds",
+    "Message pipeline stages: classify, download, OCR/transcription and their sub-stages",
+    ["stage", "media"],
+)
+SEND_SECONDS = Histogram("send_seconds", "Bot API send call, excluding rate-limit waits", ["method"])
+FORWARD_SECONDS = Histogram(
+    "forward_seconds", "From handling a message to its delivery in a target group", ["media", "route"]
+)
+MESSAGES = Counter("messages_total", "Routed messages by outcome", ["media", "outcome"])
+SENDS = Counter("sends_total", "Bot API sends by outcome", ["method", "outcome"])
+LOOP_LAG = Histogram("event_loop_lag_seconds", "How late the event loop ran a timer", buckets=LAG_BUCKETS)
+
+
+async def monitor_loop_lag(interval: float = LOOP_LAG_INTERVAL) -> None:
+    """Sleep `interval` seconds over and over; any overshoot is time the loop was busy elsewhere."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG.observe(max(0.0, loop.time() - started - interval))
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,123 @@
+import logging
+import os
+import sqlite3
+import time
+from typing import Optional
+
+from dedup import TTLCache
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_DB = os.getenv("RESULT_CACHE_DB", "media_results.db")
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+RESULT_CACHE_MEMORY = int(os.getenv("RESULT_CACHE_MEMORY", 2000))  # entries kept warm in RAM
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    file_unique_id TEXT NOT NULL,
+    engine TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (file_unique_id, engine, variant)
+)
+"""
+
+
+class ResultCache:
+    """OCR/transcription results on disk, keyed by file, engine and model variant.
+
+    The variant carries whatever changes the output (tesseract language
+    pack, whisper model size and compute type), so upgrading a model never
+    serves stale text. A small LRU keeps recent results in memory; the
+    SQLite tier is trimmed least-recently-used first once it grows past
+    `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        path: str = RESULT_CACHE_DB,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+        memory_size: int = RESULT_CACHE_MEMORY,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._memory = TTLCache(memory_size, ttl=float("inf"))
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        with self._conn:
+            self._conn.execute(SCHEMA)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        self.total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        self.disk_hits = 0
+        self.evicted = 0
+
+    def get(self, file_unique_id: str, engine: str, variant: str) -> Optional[str]:
+        key = (file_unique_id, engine, variant)
+        text = self._memory.get(key)
+        if text is not None:
+            return text
+        row = self._conn.execute(
+            "SELECT text FROM results WHERE file_unique_id = ? AND engine = ? AND variant = ?", key
+        ).fetchone()
+        if row is None:
+            return None
+        with self._conn:
+            self._conn.execute(
+                "UPDATE results SET last_used = ? WHERE file_unique_id = ? AND engine = ? AND variant = ?",
+                (time.time(),) + key,
+            )
+        self.disk_hits += 1
+        self._memory.set(key, row[0])
+        return row[0]
+
+    def put(self, file_unique_id: str, engine: str, variant: str, text: str) -> None:
+        key = (file_unique_id, engine, variant)
+        size = len(text.encode("utf-8"))
+        now = time.time()
+        with self._conn:
+            old = self._conn.execute(
+                "SELECT size FROM results WHERE file_unique_id = ? AND engine = ? AND variant = ?", key
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)",
+                key + (text, size, now, now),
+            )
+        self.total_bytes += size - (old[0] if old else 0)
+        self._memory.set(key, text)
+        if self.total_bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used rows until the cache is back under 90% of its budget."""
+        target = int(self.max_bytes * 0.9)
+        freed = 0
+        victims = []
+        for file_unique_id, engine, variant, size in self._conn.execute(
+            "SELECT file_unique_id, engine, variant, size FROM results ORDER BY last_used"
+        ):
+            if self.total_bytes - freed <= target:
+                break
+            victims.append((file_unique_id, engine, variant))
+            freed += size
+        with self._conn:
+            self._conn.executemany(
+                "DELETE FROM results WHERE file_unique_id = ? AND engine = ? AND variant = ?", victims
+            )
+        self.total_bytes -= freed
+        self.evicted += len(victims)
+        logger.info(f"Result cache evicted {len(victims)} entries ({freed} bytes)")
+
+    def stats(self) -> dict:
+        return {
+            "memory": self._memory.stats(),
+            "disk_hits": self.disk_hits,
+            "disk_bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "evicted": self.evicted,
+        }
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,159 @@
+import json
+import logging
+import os
+import sqlite3
+import sys
+from typing import Optional, Tuple
+
+from routing import FILTER_ALL, FILTERS, RouteTarget, Routes, parse_routes
+
+logger = logging.getLogger(__name__)
+
+ROUTES_DB = os.getenv("ROUTES_DB", "routes.db")
+ROUTES_FILE = os.getenv("ROUTES_FILE", "routes.json")  # optional seed, same shape as routes.example.json
+
+# Applied in order; PRAGMA user_version records how many have run
+MIGRATIONS = [
+    """
+    CREATE TABLE routes (
+        source INTEGER NOT NULL,
+        target INTEGER NOT NULL,
+        filter TEXT NOT NULL DEFAULT 'all',
+        PRIMARY KEY (source, target)
+    )
+    """,
+]
+
+
+class RouteStore:
+    """Routes persisted in SQLite with an in-memory index for the hot path.
+
+    Lookups (`get`) are a dict access. Writes go to SQLite first and then
+    refresh only the affected source in the index; `reload()` rebuilds the
+    whole index, e.g. after the database was edited from outside the bot.
+    """
+
+    def __init__(self, path: str = ROUTES_DB):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._migrate()
+        self._index: Routes = {}
+        self.reload()
+
+    def _migrate(self) -> None:
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, statement in enumerate(MIGRATIONS[version:], start=version + 1):
+            with self._conn:
+                self._conn.execute(statement)
+                self._conn.execute(f"PRAGMA user_version = {number}")
+            logger.info(f"Route store migrated to schema v{number}")
+
+    def _load_source(self, source: int) -> None:
+        rows = self._conn.execute(
+            "SELECT target, filter FROM routes WHERE source = ? ORDER BY rowid", (source,)
+        ).fetchall()
+        if rows:
+            self._index[source] = tuple(RouteTarget(target, route_filter) for target, route_filter in rows)
+        else:
+            self._index.pop(source, None)
+
+    def reload(self) -> Routes:
+        """Rebuild the in-memory index from the database."""
+        index = {}
+        for source, target, route_filter in self._conn.execute(
+            "SELECT source, target, filter FROM routes ORDER BY source, rowid"
+        ):
+            index.setdefault(source, []).append(RouteTarget(target, route_filter))
+        self._index = {source: tuple(targets) for source, targets in index.items()}
+        return self._index
+
+    # --- Hot path ---
+    def get(self, source: int) -> Tuple[RouteTarget, ...]:
+        return self._index.get(source, ())
+
+    @property
+    def routes(self) -> Routes:
+        return self._index
+
+    def __len__(self) -> int:
+        return sum(len(targets) for targets in self._index.values())
+
+    # --- Admin operations ---
+    def add(self, source: int, target: int, route_filter: str = FILTER_ALL) -> None:
+        if route_filter not in FILTERS:
+            raise ValueError(f"Unknown route filter: {route_filter}")
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO routes (source, target, filter) VALUES (?, ?, ?) "
+                "ON CONFLICT (source, target) DO UPDATE SET filter = excluded.filter",
+                (source, target, route_filter),
+            )
+        self._load_source(source)
+
+    def delete(self, source: int, target: Optional[int] = None) -> int:
+        """Delete one target of a source, or all of them. Returns rows removed."""
+        with self._conn:
+            if target is None:
+                cursor = self._conn.execute("DELETE FROM routes WHERE source = ?", (source,))
+            else:
+                cursor = self._conn.execute(
+                    "DELETE FROM routes WHERE source = ? AND target = ?", (source, target)
+                )
+        self._load_source(source)
+        return cursor.rowcount
+
+    def import_routes(self, routes: Routes) -> int:
+        """Bulk upsert, in one transaction."""
+        rows = [(source, t.chat_id, t.filter) for source, targets in routes.items() for t in targets]
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO routes (source, target, filter) VALUES (?, ?, ?) "
+                "ON CONFLICT (source, target) DO UPDATE SET filter = excluded.filter",
+                rows,
+            )
+        self.reload()
+        return len(rows)
+
+    def import_json(self, path: str) -> int:
+        """Import {"src": dst} or {"src": [dst, {"chat_id": dst, "filter": "media"}]}; invalid routes are skipped."""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        routes = {}
+        for source, targets in data.items():
+            if not isinstance(targets, list):
+                targets = [targets]
+            for t in targets:
+                try:
+                    if isinstance(t, dict):
+                        target = RouteTarget(int(t["chat_id"]), str(t.get("filter", FILTER_ALL)).strip().lower())
+                    else:
+                        target = RouteTarget(int(t))
+                    if target.filter not in FILTERS:
+                        raise ValueError(target.filter)
+                    routes.setdefault(int(source), []).append(target)
+                except (KeyError, TypeError, ValueError):
+                    logger.warning(f"Invalid route in {path}: {source} -> {t}")
+        return self.import_routes({source: tuple(targets) for source, targets in routes.items()})
+
+    def seed(self) -> None:
+        """Fill an empty store from ROUTES_FILE, or else the ROUTES_MAP env var."""
+        if self._index:
+            return
+        if os.path.exists(ROUTES_FILE):
+            count = self.import_json(ROUTES_FILE)
+            logger.info(f"Imported {count} routes from {ROUTES_FILE}")
+        else:
+            count = self.import_routes(parse_routes(os.getenv("ROUTES_MAP", "")))
+            if count:
+                logger.info(f"Imported {count} routes from ROUTES_MAP")
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+if __name__ == "__main__":
+    # python route_store.py import routes.example.json
+    if len(sys.argv) != 3 or sys.argv[1] != "import":
+        sys.exit("Usage: python route_store.py import <routes.json>")
+    store = RouteStore()
+    print(f"Imported {store.import_json(sys.argv[2])} routes into {store.path}")
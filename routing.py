@@ -0,0 +1,65 @@
+import logging
+from typing import Dict, NamedTuple, Tuple
+
+from telegram import Message
+
+logger = logging.getLogger(__name__)
+
+# --- Per-target filters ---
+FILTER_ALL = "all"            # homework text plus any media (the default)
+FILTER_MEDIA = "media"        # photos, voice notes, audio, videos, documents only
+FILTER_HOMEWORK = "homework"  # anything whose text/caption/OCR reads as homework
+FILTERS = (FILTER_ALL, FILTER_MEDIA, FILTER_HOMEWORK)
+# Message attributes that count as media for the filters; stickers, polls, locations etc. don't
+MEDIA_ATTRIBUTES = ("photo", "voice", "audio", "video", "video_note", "document")
+
+
+def has_media(message: Message) -> bool:
+    return any(getattr(message, attribute) for attribute in MEDIA_ATTRIBUTES)
+
+
+def is_service_message(message: Message) -> bool:
+    """Joins, leaves, pins, title changes...: no text and nothing attached, and Telegram refuses to copy them."""
+    return not message.text and message.effective_attachment is None
+
+
+class RouteTarget(NamedTuple):
+    chat_id: int
+    filter: str = FILTER_ALL
+
+    def accepts(self, message: Message, is_homework: bool) -> bool:
+        """Decide from an already classified message; no per-target re-classification."""
+        if self.filter == FILTER_MEDIA:
+            return has_media(message)
+        if self.filter == FILTER_HOMEWORK:
+            return is_homework
+        return is_homework or has_media(message)
+
+
+Routes = Dict[int, Tuple[RouteTarget, ...]]
+
+
+def add_target(routes: Routes, source: int, target: RouteTarget) -> None:
+    """Append a target to a source, replacing an existing entry for the same chat."""
+    others = tuple(t for t in routes.get(source, ()) if t.chat_id != target.chat_id)
+    routes[source] = others + (target,)
+
+
+def parse_routes(raw: str) -> Routes:
+    """Parse "src:dst[:filter],..." — repeat a source to fan out to several targets."""
+    routes = {}
+    for route in raw.split(","):
+        if not route.strip():
+            continue
+        try:
+            parts = route.strip().split(":")
+            src, dst = int(parts[0]), int(parts[1])
+            route_filter = parts[2].strip().lower() if len(parts) > 2 else FILTER_ALL
+            if len(parts) > 3 or route_filter not in FILTERS:
+                raise ValueError(route)
+        except (ValueError, IndexError):
+            logger.warning(f"Invalid route format: {route}")
+            continue
+        add_target(routes, src, RouteTarget(dst, route_filter))
+    return routes
+
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from telegram.error import BadRequest, Forbidden, InvalidToken, NetworkError, RetryAfter
+
+from metrics import SEND_SECONDS, SENDS
+
+logger = logging.getLogger(__name__)
+
+# Telegram flood limits: ~30 messages/second overall, ~20 messages/minute per group
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", 30))       # messages per second
+SEND_GLOBAL_BURST = float(os.getenv("SEND_GLOBAL_BURST", 30))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", 20))           # messages per minute, per target
+SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", 3))
+SEND_QUEUE_SIZE = int(os.getenv("SEND_QUEUE_SIZE", 500))          # per target
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", 5))
+SEND_BACKOFF_BASE = float(os.getenv("SEND_BACKOFF_BASE", 0.5))    # seconds
+SEND_BACKOFF_MAX = float(os.getenv("SEND_BACKOFF_MAX", 30))
+
+
+class SendDropped(Exception):
+    """A send was given up on (target queue full or retries exhausted)."""
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations instead of blocking.
+
+    `reserve()` always takes a token and returns how long the caller has to
+    wait before using it; tokens may go negative, which queues callers in
+    reservation order. `pause()` blocks the bucket, e.g. for a RetryAfter.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def pause(self, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class _Target:
+    def __init__(self, chat_rate: float, chat_burst: float):
+        self.bucket = TokenBucket(chat_rate, chat_burst)
+        self.queue = deque()
+        self.task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.retried = 0
+        self.dropped = 0
+        self.failed = 0
+
+
+class SendScheduler:
+    """Queues outbound Bot API calls per target chat under global and per-chat rate limits.
+
+    Sends to one target go out in submission order. RetryAfter pauses that
+    target for exactly the time Telegram asks for; transient network errors
+    are retried with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = SEND_GLOBAL_RATE,
+        global_burst: float = SEND_GLOBAL_BURST,
+        chat_rate_per_minute: float = SEND_CHAT_RATE,
+        chat_burst: float = SEND_CHAT_BURST,
+        queue_size: int = SEND_QUEUE_SIZE,
+        max_retries: int = SEND_MAX_RETRIES,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_rate = chat_rate_per_minute / 60.0
+        self.chat_burst = chat_burst
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.targets = {}
+        self.retry_after_events = 0
+
+    def _target(self, chat_id: int) -> _Target:
+        target = self.targets.get(chat_id)
+        if target is None:
+            target = self.targets[chat_id] = _Target(self.chat_rate, self.chat_burst)
+        return target
+
+    def submit(self, chat_id: int, func: Callable[..., Awaitable], /, *args, **kwargs) -> asyncio.Future:
+        """Queue `func(*args, **kwargs)` for `chat_id`; the future resolves with its result."""
+        future = asyncio.get_running_loop().create_future()
+        target = self._target(chat_id)
+        if len(target.queue) >= self.queue_size:
+            target.dropped += 1
+            SENDS.inc(method=getattr(func, "__name__", "send"), outcome="dropped")
+            logger.warning(f"Send queue for {chat_id} is full, dropping message")
+            future.set_exception(SendDropped(f"send queue for {chat_id} is full"))
+            return future
+        target.queue.append((func, args, kwargs, future))
+        if target.task is None or target.task.done():
+            target.task = asyncio.create_task(self._drain(chat_id, target), name=f"send-{chat_id}")
+        return future
+
+    async def send(self, chat_id: int, func: Callable[..., Awaitable], /, *args, **kwargs):
+        """Queue a send and wait for Telegram's answer."""
+        return await self.submit(chat_id, func, *args, **kwargs)
+
+    async def _drain(self, chat_id: int, target: _Target) -> None:
+        while target.queue:
+            func, args, kwargs, future = target.queue[0]
+            try:
+                result = await self._deliver(chat_id, target, func, args, kwargs)
+            except asyncio.CancelledError:
+                # stop() gave up on this target: nothing queued will be sent, so nobody may wait on it
+                for _, _, _, queued in target.queue:
+                    queued.cancel()
+                target.queue.clear()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            target.queue.popleft()
+
+    async def _deliver(self, chat_id: int, target: _Target, func, args, kwargs):
+        attempt = 0
+        while True:
+            await asyncio.sleep(target.bucket.reserve())
+            await asyncio.sleep(self.global_bucket.reserve())
+            method = getattr(func, "__name__", "send")
+            started = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+                target.sent += 1
+                SEND_SECONDS.observe(time.perf_counter() - started, method=method)
+                SENDS.inc(method=method, outcome="sent")
+                return result
+            except RetryAfter as e:
+                # Flood wait: honour it exactly, it does not count against the retry budget
+                SENDS.inc(method=method, outcome="retry_after")
+                self.retry_after_events += 1
+                target.bucket.pause(float(e.retry_after))
+                logger.warning(f"Flood limit for {chat_id}, retrying in {e.retry_after}s")
+            except (BadRequest, Forbidden, InvalidToken):
+                SENDS.inc(method=method, outcome="failed")
+                target.failed += 1
+                raise
+            except NetworkError as e:
+                SENDS.inc(method=method, outcome="network_error")
+                attempt += 1
+                if attempt > self.max_retries:
+                    target.dropped += 1
+                    logger.error(f"Giving up on send to {chat_id} after {self.max_retries} retries: {e}")
+                    raise SendDropped(str(e)) from e
+                target.retried += 1
+                # Full jitter: spread retries so a network blip does not resend in lockstep
+                delay = random.uniform(0, min(SEND_BACKOFF_MAX, SEND_BACKOFF_BASE * 2 ** attempt))
+                logger.warning(f"Send to {chat_id} failed ({e}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Let queued sends finish, then cancel whatever is left."""
+        tasks = [t.task for t in self.targets.values() if t.task and not t.task.done()]
+        if not tasks:
+            return
+        done, pending = await asyncio.wait(tasks, timeout=drain_timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if pending:
+            logger.warning(f"Send scheduler stopped with {len(pending)} targets still queued")
+
+    def stats(self) -> dict:
+        return {
+            "retry_after_events": self.retry_after_events,
+            "targets": {
+                str(chat_id): {
+                    "depth": len(t.queue),
+                    "sent": t.sent,
+                    "retried": t.retried,
+                    "dropped": t.dropped,
+                    "failed": t.failed,
+                }
+                for chat_id, t in self.targets.items()
+            },
+        }
@@ -1,22 +1,33 @@
 import os
 import asyncio
-import hashlib
+from dotenv import load_dotenv
 from telegram.ext import ApplicationBuilder
 
-#  Environment variables
-TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+load_dotenv()
+
+#  Environment variables (BOT_TOKEN as in main.py; TELEGRAM_BOT_TOKEN still works)
+TOKEN = os.getenv("BOT_TOKEN") or os.getenv("TELEGRAM_BOT_TOKEN")
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")
 
-#  Secure webhook path
-SECRET_PATH = hashlib.sha256(TOKEN.encode()).hexdigest()
+from webhook import ALLOWED_UPDATES, WEBHOOK_SECRET, secret_path
+
+#  Secure webhook path (main.py routes it)
+SECRET_PATH = secret_path(TOKEN)
 
 async def set_webhook():
     application = ApplicationBuilder().token(TOKEN).build()
-    secure_url = f"{WEBHOOK_URL}/{SECRET_PATH}"
-    success = await application.bot.set_webhook(url=secure_url)
-    
+    secure_url = f"{WEBHOOK_URL.rstrip('/')}/{SECRET_PATH}"
+    #  Telegram echoes secret_token in a header main.py checks, and only sends the update types we handle
+    success = await application.bot.set_webhook(
+        url=secure_url,
+        secret_token=WEBHOOK_SECRET or None,
+        allowed_updates=ALLOWED_UPDATES,
+    )
+
     if success:
         print(" Webhook set successfully!")
+        if not WEBHOOK_SECRET:
+            print(" WEBHOOK_SECRET is not set: the webhook accepts unauthenticated POSTs.")
     else:
         print(" Failed to set webhook.")
 
@@ -0,0 +1,161 @@
+import heapq
+import itertools
+import logging
+import os
+import time
+from array import array
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+SPAM_WINDOW = float(os.getenv("SPAM_WINDOW", 600))            # seconds
+SPAM_BUCKETS = int(os.getenv("SPAM_BUCKETS", 10))             # window resolution
+SPAM_MAX_JUNK = int(os.getenv("SPAM_MAX_JUNK", 3))            # junk messages per window before blocking
+SPAM_BLOCK_SECONDS = float(os.getenv("SPAM_BLOCK_SECONDS", 3600))
+SPAM_MAX_SENDERS = int(os.getenv("SPAM_MAX_SENDERS", 10000))  # least recently seen senders are forgotten
+# "drop": ignore a blocked sender's messages, "mute": also restrict them in the group, "off": only count
+SPAM_ACTION = os.getenv("SPAM_ACTION", "drop").lower()
+
+
+class _Sender:
+    __slots__ = ("name", "buckets", "last_bucket", "total", "blocked_until")
+
+    def __init__(self, bucket_count: int):
+        self.name = ""
+        self.buckets = array("H", bytes(2 * bucket_count))  # junk per time slice, used as a ring
+        self.last_bucket = 0
+        self.total = 0
+        self.blocked_until = 0.0
+
+
+class Offender(NamedTuple):
+    sender_id: int
+    name: str
+    total: int          # junk messages since the sender was first tracked
+    recent: int         # junk messages in the current window
+    blocked_until: float
+
+
+class SpamTracker:
+    """Sliding-window junk counters per sender, fed by the classifier's junk verdicts.
+
+    Each sender has a small ring of per-slice counters covering SPAM_WINDOW
+    seconds. A sender who sends SPAM_MAX_JUNK junk messages within the
+    window is blocked for SPAM_BLOCK_SECONDS, and handle_message drops
+    their messages before any OCR or transcription. At most
+    SPAM_MAX_SENDERS senders are tracked. Top offenders come from a lazily
+    updated heap, so listing k of them costs O(k log n).
+    """
+
+    def __init__(
+        self,
+        window: float = SPAM_WINDOW,
+        buckets: int = SPAM_BUCKETS,
+        max_junk: int = SPAM_MAX_JUNK,
+        block_seconds: float = SPAM_BLOCK_SECONDS,
+        max_senders: int = SPAM_MAX_SENDERS,
+    ):
+        self.bucket_count = max(1, buckets)
+        self.slice = window / self.bucket_count
+        self.max_junk = max(1, max_junk)
+        self.block_seconds = block_seconds
+        self.max_senders = max(1, max_senders)
+        self._senders: "OrderedDict[int, _Sender]" = OrderedDict()
+        self._heap = []  # (-total, seq, sender_id); stale entries are skipped and dropped
+        self._seq = itertools.count()
+        self.junk = 0
+        self.blocks = 0
+        self.dropped = 0
+
+    def _advance(self, sender: _Sender, now: float) -> None:
+        """Zero the slices that fell out of the window since the sender was last seen."""
+        bucket = int(now // self.slice)
+        for b in range(max(sender.last_bucket + 1, bucket - self.bucket_count + 1), bucket + 1):
+            sender.buckets[b % self.bucket_count] = 0
+        sender.last_bucket = max(sender.last_bucket, bucket)
+
+    def _recent(self, sender: _Sender, now: float) -> int:
+        self._advance(sender, now)
+        return sum(sender.buckets)
+
+    def is_blocked(self, sender_id: Optional[int], now: Optional[float] = None) -> bool:
+        """True while `sender_id` is blocked, without counting anything."""
+        sender = self._senders.get(sender_id)
+        return sender is not None and sender.blocked_until > (now or time.time())
+
+    def blocked(self, sender_id: Optional[int], now: Optional[float] = None) -> bool:
+        """True while `sender_id` is blocked; counts the message as dropped."""
+        if not self.is_blocked(sender_id, now):
+            return False
+        self.dropped += 1
+        return True
+
+    def record_junk(self, sender_id: int, name: str = "", now: Optional[float] = None) -> bool:
+        """Count one junk message. Returns True when this message gets the sender blocked."""
+        now = now or time.time()
+        sender = self._senders.get(sender_id)
+        if sender is None:
+            sender = self._senders[sender_id] = _Sender(self.bucket_count)
+            sender.last_bucket = int(now // self.slice)
+            if len(self._senders) > self.max_senders:
+                self._senders.popitem(last=False)
+        else:
+            self._senders.move_to_end(sender_id)
+            self._advance(sender, now)
+        sender.name = name or sender.name
+        slot = int(now // self.slice) % self.bucket_count
+        sender.buckets[slot] = min(sender.buckets[slot] + 1, 0xFFFF)
+        sender.total += 1
+        self.junk += 1
+        heapq.heappush(self._heap, (-sender.total, next(self._seq), sender_id))
+        if len(self._heap) > 4 * len(self._senders) + 64:
+            self._compact()
+        if sender.blocked_until <= now and sum(sender.buckets) >= self.max_junk:
+            sender.blocked_until = now + self.block_seconds
+            self.blocks += 1
+            logger.warning(f"Blocked sender {sender_id} ({sender.name}) for {self.block_seconds:.0f}s after repeated junk")
+            return True
+        return False
+
+    def _compact(self) -> None:
+        self._heap = [(-s.total, next(self._seq), sender_id) for sender_id, s in self._senders.items()]
+        heapq.heapify(self._heap)
+
+    def top(self, k: int = 10, now: Optional[float] = None) -> List[Offender]:
+        """The `k` senders with the most junk, worst first."""
+        now = now or time.time()
+        found, seen = [], set()
+        while self._heap and len(found) < k:
+            entry = heapq.heappop(self._heap)
+            sender_id = entry[2]
+            sender = self._senders.get(sender_id)
+            if sender is None or -entry[0] != sender.total or sender_id in seen:
+                continue  # evicted, cleared or superseded by a newer entry
+            seen.add(sender_id)
+            found.append(entry)
+        for entry in found:
+            heapq.heappush(self._heap, entry)
+        return [
+            Offender(sender_id, sender.name, sender.total, self._recent(sender, now), sender.blocked_until)
+            for sender_id, sender in ((entry[2], self._senders[entry[2]]) for entry in found)
+        ]
+
+    def clear(self, sender_id: Optional[int] = None) -> int:
+        """Forget one sender (unblocking them) or everyone. Returns senders removed."""
+        if sender_id is None:
+            count = len(self._senders)
+            self._senders.clear()
+            self._heap = []
+            return count
+        return 1 if self._senders.pop(sender_id, None) is not None else 0
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "tracked": len(self._senders),
+            "blocked_now": sum(1 for s in self._senders.values() if s.blocked_until > now),
+            "junk": self.junk,
+            "blocks": self.blocks,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,40 @@
+import os
+import shutil
+
+import pytest
+
+from media import audio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+
+
+@needs_ffmpeg
+def test_voice_note_decodes_from_a_pipe():
+    with open(os.path.join(ROOT, "audio_2025-05-08_16-12-15.ogg"), "rb") as f:
+        samples = audio.decode_audio(f.read())
+    assert samples.size > 0
+
+
+def test_corrupt_upload_is_not_retried_through_a_temp_file(monkeypatch):
+    sources = []
+
+    def failing(source, data=None):
+        sources.append(source)
+        raise RuntimeError("Invalid data found when processing input")
+
+    monkeypatch.setattr(audio, "_ffmpeg_decode", failing)
+    assert audio.decode_audio(b"not audio at all").size == 0
+    assert sources == ["pipe:0"]
+
+
+def test_mp4_is_retried_through_a_temp_file(monkeypatch):
+    sources = []
+
+    def failing(source, data=None):
+        sources.append(source)
+        raise RuntimeError("moov atom not found")
+
+    monkeypatch.setattr(audio, "_ffmpeg_decode", failing)
+    audio.decode_audio(b"\x00\x00\x00\x20ftypisom" + bytes(32))
+    assert sources[0] == "pipe:0" and len(sources) == 2
@@ -0,0 +1,57 @@
+import pytest
+
+import classifier
+from classifier import Classifier, classify
+
+
+class FixedScores(Classifier):
+    def __init__(self, scores):
+        self.scores = scores
+
+    def predict_batch(self, texts):
+        return [dict(self.scores) for _ in texts]
+
+
+@pytest.fixture
+def model(monkeypatch):
+    def use(scores):
+        monkeypatch.setattr(classifier, "_model", FixedScores(scores))
+    monkeypatch.setattr(classifier, "CLASSIFIER_THRESHOLD", 0.5)
+    monkeypatch.setattr(classifier, "CLASSIFIER_MIN_CONFIDENCE", 0.7)
+    return use
+
+
+def test_classifier_is_abstract():
+    with pytest.raises(TypeError):
+        Classifier()
+
+
+def test_keyword_rules_without_a_model(monkeypatch):
+    monkeypatch.setattr(classifier, "_model", None)
+    verdict = classify("Homework: page 12")
+    assert (verdict.homework, verdict.junk, verdict.source) == (True, False, "keywords")
+    assert classify("cheap price promo").junk
+
+
+def test_confident_model_overrides_keywords(model):
+    model({"homework": 0.05, "junk": 0.02})
+    verdict = classify("Homework: page 12")
+    assert (verdict.homework, verdict.junk, verdict.source) == (False, False, "model")
+
+    model({"homework": 0.95, "junk": 0.01})
+    verdict = classify("please finish this before friday")
+    assert (verdict.homework, verdict.source) == (True, "model")
+
+
+def test_low_confidence_falls_back_to_keywords(model):
+    model({"homework": 0.55, "junk": 0.4})
+    verdict = classify("Homework: page 12")
+    assert (verdict.homework, verdict.junk, verdict.source) == (True, False, "keywords")
+    verdict = classify("good morning class")
+    assert (verdict.homework, verdict.source) == (False, "keywords")
+
+
+def test_each_label_falls_back_on_its_own(model):
+    model({"homework": 0.9, "junk": 0.5})
+    verdict = classify("homework promo")
+    assert (verdict.homework, verdict.junk, verdict.source) == (True, True, "model")
@@ -0,0 +1,83 @@
+from telegram import Message
+
+from dedup import DedupCache, UpdateWindow
+
+CHAT = -1001
+
+
+def message(message_id: int, **content) -> Message:
+    return Message.de_json(dict(message_id=message_id, date=0, chat={"id": CHAT, "type": "supergroup"}, **content), None)
+
+
+def test_content_key_covers_media_and_text():
+    dedup = DedupCache(db_path="")
+    photo = [{"file_id": "a", "file_unique_id": "same", "width": 9, "height": 9}]
+    assert dedup.content_key(message(1, photo=photo)) == dedup.content_key(message(2, photo=photo))
+    assert dedup.content_key(message(1, text="Homework: page 4")) == dedup.content_key(message(2, text="homework:  PAGE 4"))
+    assert dedup.content_key(message(1, photo=photo)) != dedup.content_key(message(2, photo=photo, caption="page 5"))
+
+
+def test_messages_without_media_or_text_have_no_content_key():
+    dedup = DedupCache(db_path="")
+    location = message(1, location={"latitude": 27.47, "longitude": 89.64})
+    dice = message(2, dice={"emoji": "🎲", "value": 3})
+    joined = message(3, new_chat_members=[{"id": 7, "is_bot": False, "first_name": "Pema"}])
+    assert [dedup.content_key(m) for m in (location, dice, joined)] == [None, None, None]
+
+
+def test_redelivered_update_is_detected():
+    window = UpdateWindow(size=64, db_path="")
+    assert [window.seen(i) for i in (100, 101, 103)] == [False, False, False]
+    assert window.seen(101) and window.seen(103)
+    # An id skipped while the window moved past it is still new
+    assert not window.seen(102)
+    assert window.redeliveries == 2
+
+
+def test_forget_lets_the_redelivery_through():
+    window = UpdateWindow(size=64, db_path="")
+    window.seen(100)
+    # de_json/processing failed, or the queue was full and Telegram got a 429
+    window.forget(100)
+    assert not window.seen(100)
+    assert window.seen(100)
+
+
+def test_ids_behind_the_window_restart_it():
+    window = UpdateWindow(size=64, db_path="")
+    window.seen(1000)
+    assert not window.seen(1000 - 64)
+    assert window.resets == 1 and window.high == 1000 - 64
+    assert window.seen(1000 - 64)
+
+
+def test_window_wraps_around():
+    window = UpdateWindow(size=64, db_path="")
+    for update_id in range(1, 200):
+        assert not window.seen(update_id)
+    # Same bit as 199 - 64 once the ring wrapped: the oldest ids in the window still count
+    assert window.seen(199 - 63)
+    assert window.seen(199)
+    # A jump of more than the window clears every bit
+    assert not window.seen(1000)
+    assert not window.seen(1000 - 63)
+    assert window.resets == 0
+
+
+def test_window_survives_a_restart(tmp_path):
+    path = str(tmp_path / "dedup.db")
+    window = UpdateWindow(size=64, db_path=path, save_every=3600)
+    for update_id in (10, 11, 12):
+        window.seen(update_id)
+    window.forget(12)
+    window.close()
+
+    restarted = UpdateWindow(size=64, db_path=path)
+    assert restarted.high == 12
+    assert restarted.seen(10) and restarted.seen(11)
+    assert not restarted.seen(12)
+    restarted.close()
+    # A different size can't reuse the saved bits
+    resized = UpdateWindow(size=128, db_path=path)
+    assert resized.high is None
+    resized.close()
@@ -0,0 +1,31 @@
+import asyncio
+
+from telegram import Message
+from telegram.error import Forbidden
+
+from forward_log import ForwardLog
+from handlers import _log_forward
+
+
+def test_only_targets_that_got_the_message_are_logged(tmp_path):
+    log = ForwardLog(str(tmp_path / "forward_log.db"))
+    message = Message.de_json({"message_id": 5, "date": 0, "chat": {"id": -1001, "type": "supergroup"}, "text": "hw"}, None)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        sent, refused, dropped = loop.create_future(), loop.create_future(), loop.create_future()
+        sends = [(-1101, sent), (-1102, refused), (-1103, dropped)]
+        settled = asyncio.gather(sent, refused, dropped, return_exceptions=True)
+        settled.add_done_callback(_log_forward(log, message, "hw", True, sends))
+        sent.set_result(True)
+        assert log.recent() == []
+        refused.set_exception(Forbidden("bot was kicked"))
+        dropped.cancel()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    [entry] = log.recent()
+    assert entry.targets == (-1101,)
+    assert [(day.messages, day.deliveries) for day in log.daily_counts()] == [(1, 1)]
+    log.close()
@@ -0,0 +1,15 @@
+from keywords import KeywordEngine
+
+
+def test_matches_after_cache_overflow():
+    engine = KeywordEngine({"strong": ["homework"]}, cache_size=3)
+    assert engine.matches("homework a") == {"homework"}
+    # Overflows the token cache; "homework" was analysed before the clear
+    assert engine.matches("homework b c d") == {"homework"}
+    assert engine.matches("homework") == {"homework"}
+
+
+def test_phrases_after_cache_overflow():
+    engine = KeywordEngine({"strong": ["class test"]}, cache_size=2)
+    assert engine.matches("class test") == {"class test"}
+    assert engine.matches("class test on monday") == {"class test"}
@@ -0,0 +1,17 @@
+import asyncio
+import os
+
+from media_executor import MediaExecutor
+
+
+def test_warmup_runs_once_in_every_worker():
+    async def scenario():
+        executor = MediaExecutor(cpu_workers=3, io_workers=1, timeout=30)
+        try:
+            return await executor.warmup(os.getpid), await executor.warmup(os.getpid, workers=2)
+        finally:
+            executor.shutdown(wait=True)
+
+    everywhere, some = asyncio.run(scenario())
+    assert len(set(everywhere)) == 3
+    assert len(set(some)) == 2
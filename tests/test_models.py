@@ -0,0 +1,17 @@
+from media import models
+from media.models import ModelSpec, parse_route_models
+
+
+def test_configured_specs_with_profiles_differing_only_in_language(monkeypatch):
+    monkeypatch.setenv("STT_MODELS", "english=tiny/int8@en,big=small/int8")
+    monkeypatch.setenv("STT_ROUTE_MODELS", "-1001:english,-1002:big")
+    models.load_model_config()
+    specs = models.configured_specs()
+    assert [(s.size, s.compute_type) for s in specs] == [("small", "int8"), ("tiny", "int8")]
+    assert ModelSpec("tiny", "int8", None) in specs
+    monkeypatch.undo()
+    models.load_model_config()
+
+
+def test_parse_route_models_skips_malformed_entries():
+    assert parse_route_models("-1001:english,oops:big,nocolon, -1002:big") == {-1001: "english", -1002: "big"}
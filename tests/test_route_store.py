@@ -0,0 +1,15 @@
+import json
+
+from route_store import RouteStore
+from routing import RouteTarget
+
+
+def test_import_json_skips_unknown_filters(tmp_path):
+    routes_file = tmp_path / "routes.json"
+    routes_file.write_text(json.dumps({
+        "-1": [-2, {"chat_id": -3, "filter": "homwork"}, {"chat_id": -4, "filter": "Media"}],
+    }))
+    store = RouteStore(str(tmp_path / "routes.db"))
+    assert store.import_json(str(routes_file)) == 2
+    assert store.get(-1) == (RouteTarget(-2), RouteTarget(-4, "media"))
+    store.close()
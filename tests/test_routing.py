@@ -0,0 +1,49 @@
+from telegram import Message
+
+from routing import FILTER_ALL, FILTER_HOMEWORK, FILTER_MEDIA, RouteTarget, is_service_message
+
+CHAT = -1001
+
+
+def message(**content) -> Message:
+    return Message.de_json(dict(message_id=1, date=0, chat={"id": CHAT, "type": "supergroup"}, **content), None)
+
+
+PHOTO = message(photo=[{"file_id": "p", "file_unique_id": "p", "width": 9, "height": 9}])
+VOICE = message(voice={"file_id": "v", "file_unique_id": "v", "duration": 3})
+TEXT = message(text="Homework: page 4")
+STICKER = message(sticker={
+    "file_id": "s", "file_unique_id": "s", "width": 9, "height": 9,
+    "is_animated": False, "is_video": False, "type": "regular",
+})
+LOCATION = message(location={"latitude": 27.47, "longitude": 89.64})
+JOINED = message(new_chat_members=[{"id": 7, "is_bot": False, "first_name": "Pema"}])
+
+
+def test_media_filter_takes_only_real_media():
+    target = RouteTarget(-1101, FILTER_MEDIA)
+    assert target.accepts(PHOTO, False) and target.accepts(VOICE, False)
+    for other in (TEXT, STICKER, LOCATION, JOINED):
+        assert not target.accepts(other, True)
+
+
+def test_all_filter_takes_homework_and_media():
+    target = RouteTarget(-1101, FILTER_ALL)
+    assert target.accepts(PHOTO, False)
+    assert target.accepts(TEXT, True)
+    assert not target.accepts(TEXT, False)
+    assert not target.accepts(STICKER, False)
+    assert not target.accepts(JOINED, False)
+
+
+def test_homework_filter_follows_the_verdict():
+    target = RouteTarget(-1101, FILTER_HOMEWORK)
+    assert target.accepts(PHOTO, True)
+    assert not target.accepts(PHOTO, False)
+
+
+def test_service_messages():
+    assert is_service_message(JOINED)
+    assert is_service_message(message(pinned_message={"message_id": 2, "date": 0, "chat": {"id": CHAT, "type": "supergroup"}}))
+    for other in (PHOTO, TEXT, STICKER, LOCATION):
+        assert not is_service_message(other)
@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+import pytest
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+import send_scheduler
+from send_scheduler import SendDropped, SendScheduler
+
+
+def test_stop_cancels_in_flight_and_queued_sends():
+    async def scenario():
+        scheduler = SendScheduler()
+        started = asyncio.Event()
+
+        async def hang(text):
+            started.set()
+            await asyncio.sleep(3600)
+
+        futures = [scheduler.submit(-1002, hang, f"message {i}") for i in range(3)]
+        waiter = asyncio.ensure_future(scheduler.send(-1002, hang, "message 3"))
+        await started.wait()
+        await scheduler.stop(drain_timeout=0.05)
+        await asyncio.sleep(0)
+        assert all(future.cancelled() for future in futures)
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(waiter, 1)
+        assert scheduler.stats()["targets"]["-1002"]["depth"] == 0
+
+    asyncio.run(scenario())
+
+
+def fast_scheduler(**kwargs) -> SendScheduler:
+    """Rate limits out of the way, so only the error handling decides the timing."""
+    return SendScheduler(global_rate=1000, global_burst=1000, chat_rate_per_minute=60000, chat_burst=1000, **kwargs)
+
+
+class FlakySend:
+    """Raises the given errors on the first calls, then succeeds."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = []
+
+    async def __call__(self, text):
+        self.calls.append(time.monotonic())
+        if self.errors:
+            raise self.errors.pop(0)
+        return text
+
+
+def test_retry_after_pauses_the_target_then_retries():
+    async def scenario():
+        scheduler = fast_scheduler()
+        send = FlakySend(RetryAfter(0.3))
+        assert await scheduler.send(-1002, send, "hw") == "hw"
+        first, second = send.calls
+        assert 0.3 <= second - first < 0.5
+        # Telegram's wait is honoured exactly and is not spent from the retry budget
+        assert scheduler.targets[-1002].bucket.blocked_until >= first + 0.3
+        assert scheduler.targets[-1002].retried == 0
+        assert scheduler.retry_after_events == 1
+
+    asyncio.run(scenario())
+
+
+def test_retry_after_does_not_hold_other_targets():
+    async def scenario():
+        scheduler = fast_scheduler()
+        flooded = asyncio.ensure_future(scheduler.send(-1002, FlakySend(RetryAfter(0.5)), "hw"))
+        started = time.monotonic()
+        await scheduler.send(-1003, FlakySend(), "hw")
+        assert time.monotonic() - started < 0.2
+        await flooded
+
+    asyncio.run(scenario())
+
+
+def test_network_errors_retry_with_full_jitter(monkeypatch):
+    delays = []
+
+    def uniform(low, high):
+        delays.append((low, high))
+        return 0.0
+
+    monkeypatch.setattr(send_scheduler.random, "uniform", uniform)
+
+    async def scenario():
+        scheduler = fast_scheduler(max_retries=3)
+        send = FlakySend(NetworkError("reset"), NetworkError("reset"))
+        assert await scheduler.send(-1002, send, "hw") == "hw"
+        assert len(send.calls) == 3
+        assert scheduler.targets[-1002].retried == 2
+
+        with pytest.raises(SendDropped):
+            await scheduler.send(-1002, FlakySend(*[NetworkError("reset")] * 4), "hw")
+        assert scheduler.targets[-1002].dropped == 1
+
+    asyncio.run(scenario())
+    base = send_scheduler.SEND_BACKOFF_BASE
+    assert delays[:2] == [(0, base * 2), (0, base * 4)]
+    assert len(delays) == 2 + 3
+
+
+@pytest.mark.parametrize("error", [BadRequest("Message to copy not found"), Forbidden("bot was kicked")])
+def test_permanent_errors_are_raised_without_retry(error):
+    async def scenario():
+        scheduler = fast_scheduler()
+        send = FlakySend(error)
+        with pytest.raises(type(error)):
+            await scheduler.send(-1002, send, "hw")
+        assert len(send.calls) == 1
+        assert scheduler.targets[-1002].failed == 1
+        assert scheduler.targets[-1002].retried == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,13 @@
+from spam_tracker import SpamTracker
+
+
+def test_only_blocked_counts_dropped_messages():
+    spam = SpamTracker(window=600, max_junk=2, block_seconds=60)
+    assert not spam.record_junk(7, "Pema", now=1000)
+    assert spam.record_junk(7, "Pema", now=1001)
+    # prefetch_media checks first, handle_message then drops the same message once
+    assert spam.is_blocked(7, now=1002)
+    assert spam.blocked(7, now=1002)
+    assert spam.dropped == 1
+    assert not spam.is_blocked(7, now=1062) and not spam.blocked(7, now=1062)
+    assert spam.dropped == 1
@@ -0,0 +1,131 @@
+"""A burst of voice notes from one class chat is transcribed in one batch, in order."""
+import asyncio
+import io
+
+import numpy as np
+from telegram import Message
+
+import media.processor as processor
+import media.transcriber as transcriber
+from media.processor import MediaProcessor
+from media.transcriber import BatchTranscriber
+from update_queue import UpdateQueue
+
+CHAT = -1001
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.batches = []
+
+    async def run_io(self, decode, buffer):
+        return np.full(160, float(bytes(buffer).decode()), dtype=np.float32)
+
+    async def run_cpu(self, transcribe_batch, clips, batch_size, spec):
+        self.batches.append(len(clips))
+        await asyncio.sleep(0.05)
+        return [f"note {int(clip[0])}" for clip in clips]
+
+
+def voice_message(message_id: int) -> Message:
+    return Message.de_json({
+        "message_id": message_id,
+        "date": 0,
+        "chat": {"id": CHAT, "type": "supergroup"},
+        "voice": {"file_id": f"v{message_id}", "file_unique_id": f"v{message_id}", "duration": 3},
+    }, None)
+
+
+def photo_message(message_id: int) -> Message:
+    return Message.de_json({
+        "message_id": message_id,
+        "date": 0,
+        "chat": {"id": CHAT, "type": "supergroup"},
+        "photo": [{"file_id": f"p{message_id}", "file_unique_id": f"p{message_id}", "width": 9, "height": 9}],
+    }, None)
+
+
+async def _download(self, message, kind, timings):
+    return io.BytesIO(str(message.message_id).encode())
+
+
+def fake_media(monkeypatch) -> FakeExecutor:
+    executor = FakeExecutor()
+    monkeypatch.setattr(processor, "get_media_executor", lambda: executor)
+    monkeypatch.setattr(transcriber, "get_media_executor", lambda: executor)
+    monkeypatch.setattr(MediaProcessor, "_download", _download)
+    return executor
+
+
+def run_burst(monkeypatch, prefetch: bool, notes: int = 40, limit: int = 64):
+    executor = fake_media(monkeypatch)
+
+    async def burst():
+        media = MediaProcessor(None, BatchTranscriber(window=0.1, max_clips=64), prefetch_limit=limit)
+        texts = []
+
+        async def handle(message):
+            texts.append((await media.extract_text(message)).text)
+
+        queue = UpdateQueue(handle, workers=4, key=lambda message: message.chat_id)
+        await queue.start()
+        for message_id in range(1, notes + 1):
+            message = voice_message(message_id)
+            queue.put(message)
+            if prefetch:
+                media.prefetch(message)
+        await queue.stop()
+        await media.stop()
+        return texts
+
+    return asyncio.run(burst()), executor.batches
+
+
+def test_same_chat_burst_is_batched_with_prefetch(monkeypatch):
+    texts, batches = run_burst(monkeypatch, prefetch=True)
+    assert texts == [f"note {i}" for i in range(1, 41)]
+    assert batches == [40]
+
+
+def test_same_chat_burst_is_serial_without_prefetch(monkeypatch):
+    texts, batches = run_burst(monkeypatch, prefetch=False, notes=5)
+    assert texts == [f"note {i}" for i in range(1, 6)]
+    assert batches == [1] * 5
+
+
+def test_prefetch_limit_leaves_the_rest_to_the_handler(monkeypatch):
+    texts, batches = run_burst(monkeypatch, prefetch=True, notes=10, limit=4)
+    assert texts == [f"note {i}" for i in range(1, 11)]
+    assert batches == [4] + [1] * 6
+
+
+def test_photos_are_not_prefetched(monkeypatch):
+    fake_media(monkeypatch)
+
+    async def scenario():
+        media = MediaProcessor(None, BatchTranscriber(window=0.1))
+        media.prefetch(photo_message(1))
+        media.prefetch(voice_message(2))
+        assert media.prefetches == 1
+        await media.stop()
+
+    asyncio.run(scenario())
+
+
+def test_unclaimed_prefetches_are_cancelled_past_the_cap(monkeypatch):
+    fake_media(monkeypatch)
+    monkeypatch.setattr(processor, "PREFETCH_MAX", 2)
+
+    async def scenario():
+        media = MediaProcessor(None, BatchTranscriber(window=0.1))
+        media.prefetch(voice_message(1))
+        oldest = media._prefetched[(CHAT, 1)]
+        media.prefetch(voice_message(2))
+        media.prefetch(voice_message(3))
+        await asyncio.wait([oldest])
+        await asyncio.sleep(0)
+        assert oldest.cancelled()
+        assert media.prefetching == 2
+        await media.stop()
+
+    asyncio.run(scenario())
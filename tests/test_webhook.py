@@ -0,0 +1,87 @@
+import importlib
+import json
+import sys
+
+import pytest
+
+import webhook
+
+
+@pytest.fixture
+def reload_webhook(monkeypatch):
+    """Re-import webhook.py under the monkeypatched environment, and restore it afterwards."""
+    yield lambda: importlib.reload(webhook)
+    monkeypatch.undo()
+    importlib.reload(webhook)
+
+
+def test_missing_or_wrong_secret_is_refused(monkeypatch):
+    monkeypatch.setattr(webhook, "_secret", b"s3cret")
+    assert webhook.authorized({webhook.SECRET_HEADER: "s3cret"})
+    assert not webhook.authorized({webhook.SECRET_HEADER: "wrong"})
+    assert not webhook.authorized({webhook.SECRET_HEADER: ""})
+    assert not webhook.authorized({})
+
+
+def test_secret_is_compared_in_constant_time(monkeypatch):
+    compared = []
+
+    def compare_digest(a, b):
+        compared.append((a, b))
+        return a == b
+
+    monkeypatch.setattr(webhook, "_secret", b"s3cret")
+    monkeypatch.setattr(webhook.hmac, "compare_digest", compare_digest)
+    assert not webhook.authorized({webhook.SECRET_HEADER: "s3cre"})
+    assert compared == [(b"s3cre", b"s3cret")]
+
+
+def test_no_secret_accepts_everything(monkeypatch):
+    monkeypatch.setattr(webhook, "_secret", b"")
+    assert webhook.authorized({})
+
+
+def test_only_handled_update_types_are_wanted():
+    assert webhook.wanted({"update_id": 1, "message": {}})
+    assert webhook.wanted({"update_id": 2, "edited_channel_post": {}})
+    assert not webhook.wanted({"update_id": 3, "chat_member": {}})
+    assert not webhook.wanted({"update_id": 4})
+    assert not webhook.wanted([{"message": {}}])
+
+
+def test_secret_path_is_the_token_hash():
+    assert webhook.secret_path("123:abc") == webhook.secret_path("123:abc")
+    assert len(webhook.secret_path("123:abc")) == 64
+    assert "123:abc" not in webhook.secret_path("123:abc")
+
+
+def test_json_decoder_fallback(monkeypatch, reload_webhook):
+    body = b'{"update_id": 1, "message": {"text": "\\u0f40"}}'
+    monkeypatch.setenv("JSON_DECODER", "auto")
+    monkeypatch.setitem(sys.modules, "orjson", None)  # not installed
+    module = reload_webhook()
+    assert module.decoder_name() == "json"
+    assert module.loads is json.loads
+    assert module.loads(body) == {"update_id": 1, "message": {"text": "ཀ"}}
+
+    # Forcing orjson without it installed warns and falls back
+    monkeypatch.setenv("JSON_DECODER", "orjson")
+    module = reload_webhook()
+    assert module.loads is json.loads
+
+    with pytest.raises(ValueError):
+        module.loads(b"{not json")
+
+
+def test_orjson_when_installed(monkeypatch, reload_webhook):
+    orjson = pytest.importorskip("orjson")
+    monkeypatch.setenv("JSON_DECODER", "auto")
+    module = reload_webhook()
+    assert module.decoder_name() == "orjson"
+    assert module.loads is orjson.loads
+    # orjson's decode error is a ValueError, which handle_webhook answers with a 400
+    with pytest.raises(ValueError):
+        module.loads(b"{not json")
+
+    monkeypatch.setenv("JSON_DECODER", "json")
+    assert reload_webhook().loads is json.loads
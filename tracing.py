@@ -0,0 +1,222 @@
+"""Per-update span timing, slow-update traces and an opt-in sampling profiler.
+
+Tracer wraps Application.process_update and the handler callbacks; code
+on the update's path adds spans with `span(name)` or whole timing dicts
+with `add_timings`. Outside a traced update (or with tracing off) both
+are a context-variable lookup and nothing else.
+"""
+import collections
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Updates slower than this get their trace logged and kept (0 turns tracing off)
+TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", 5))
+TRACE_KEEP = int(os.getenv("TRACE_KEEP", 50))
+# "on" starts the sampling profiler with the bot; /profile start|stop toggles it at runtime
+PROFILE = os.getenv("PROFILE", "off").lower()
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", 0.01))  # seconds between stack samples
+PROFILE_OUTPUT = os.getenv("PROFILE_OUTPUT", "profile.folded")
+
+
+class Trace:
+    __slots__ = ("update_id", "started", "spans", "attrs")
+
+    def __init__(self, update_id: Optional[int]):
+        self.update_id = update_id
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, Optional[float], float]] = []  # (name, start ms or None, duration ms)
+        self.attrs: Dict[str, object] = {}
+
+    def to_dict(self, duration: float) -> dict:
+        return {
+            "update_id": self.update_id,
+            "duration_ms": round(duration * 1000, 1),
+            **self.attrs,
+            "spans": [
+                {"name": name, "start_ms": None if start is None else round(start, 1), "ms": round(ms, 1)}
+                for name, start, ms in self.spans
+            ],
+        }
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_NULL_SPAN = contextlib.nullcontext()
+
+
+class _Span:
+    __slots__ = ("trace", "name", "started")
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        now = time.perf_counter()
+        self.trace.spans.append((self.name, (self.started - self.trace.started) * 1000, (now - self.started) * 1000))
+
+
+def span(name: str):
+    """Time a block as part of the current update's trace."""
+    trace = _current.get()
+    return _NULL_SPAN if trace is None else _Span(trace, name)
+
+
+def add_timings(timings: Dict[str, float], prefix: str = "") -> None:
+    """Attach stage timings (ms) measured elsewhere, e.g. inside a media worker."""
+    trace = _current.get()
+    if trace is not None:
+        trace.spans.extend((prefix + stage, None, ms) for stage, ms in timings.items())
+
+
+def annotate(**attrs) -> None:
+    """Add fields (media type, size, route, ...) to the current update's trace."""
+    trace = _current.get()
+    if trace is not None:
+        trace.attrs.update(attrs)
+
+
+class Tracer:
+    """Times every update and keeps a structured trace of the slow ones."""
+
+    def __init__(self, slow_seconds: float = TRACE_SLOW_SECONDS, keep: int = TRACE_KEEP):
+        self.slow_seconds = slow_seconds
+        self.recent = collections.deque(maxlen=max(1, keep))
+        self.traced = 0
+        self.slow = 0
+
+    def wrap_process_update(self, process_update):
+        @wraps(process_update)
+        async def traced(update):
+            trace = Trace(getattr(update, "update_id", None))
+            token = _current.set(trace)
+            try:
+                return await process_update(update)
+            finally:
+                _current.reset(token)
+                self._finish(trace)
+        return traced
+
+    def wrap_handlers(self, application) -> int:
+        """Give every registered handler callback its own span. Returns how many were wrapped."""
+        count = 0
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                handler.callback = _spanned(handler.callback)
+                count += 1
+        return count
+
+    def _finish(self, trace: Trace) -> None:
+        self.traced += 1
+        duration = time.perf_counter() - trace.started
+        if duration < self.slow_seconds:
+            return
+        self.slow += 1
+        record = trace.to_dict(duration)
+        self.recent.append(record)
+        logger.warning(f"Slow update {trace.update_id} ({duration:.1f}s): {json.dumps(record, default=str)}")
+
+    def stats(self) -> dict:
+        return {
+            "slow_threshold_s": self.slow_seconds,
+            "traced": self.traced,
+            "slow": self.slow,
+            "recent_slow": list(self.recent)[-5:],
+        }
+
+
+def _spanned(callback):
+    @wraps(callback)
+    async def handler(update, context):
+        with span(f"handler.{callback.__name__}"):
+            return await callback(update, context)
+    return handler
+
+
+# --- Sampling profiler ---
+def _collapse(frame) -> str:
+    """Stack as "file:function;file:function" from the outermost frame in, as flamegraph tools expect."""
+    names = []
+    while frame is not None and len(names) < 128:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    """Samples one thread's stack (the event loop's) from a daemon thread.
+
+    Every PROFILE_INTERVAL seconds the target thread's current frame is
+    collapsed into a stack string and counted; dump() writes the counts as
+    collapsed stacks for flamegraph.pl / speedscope. Costs nothing while
+    stopped and one stack walk per sample while running.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self.thread_id: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, thread_id: Optional[int] = None) -> None:
+        """Start sampling `thread_id` (default: the calling thread)."""
+        if self.running:
+            return
+        self.thread_id = thread_id or threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"Sampling profiler started ({self.interval * 1000:.0f} ms interval)")
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            logger.info(f"Sampling profiler stopped after {self.samples} samples")
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[_collapse(frame)] += 1
+                self.samples += 1
+
+    def top(self, n: int = 5) -> List[Tuple[str, int]]:
+        """Innermost frames that were on top of the stack most often."""
+        leaves = collections.Counter()
+        for stack, count in list(self.stacks.items()):
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(n)
+
+    def dump(self, path: str = PROFILE_OUTPUT) -> str:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in list(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+        return path
+
+    def reset(self) -> None:
+        self.stacks.clear()
+        self.samples = 0
+
+    def stats(self) -> dict:
+        return {"running": self.running, "samples": self.samples, "stacks": len(self.stacks)}
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Hashable, Optional
+
+from metrics import UPDATE_QUEUE_WAIT
+
+logger = logging.getLogger(__name__)
+
+# --- Backpressure policies ---
+POLICY_DROP = "drop"      # acknowledge with 200 and discard the update
+POLICY_REJECT = "reject"  # answer 429 so Telegram redelivers later
+POLICIES = (POLICY_DROP, POLICY_REJECT)
+
+
+def _percentile(samples, pct: float) -> float:
+    """Nearest-rank percentile of a small sample window (0.0 when empty)."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class UpdateQueue:
+    """Bounded in-process queue that feeds webhook updates to N async workers.
+
+    With a `key` function (e.g. the source chat id) updates are kept in one
+    FIFO lane per key: a lane is handled by at most one worker at a time, so
+    a chat's updates are processed in arrival order, while different chats
+    run in parallel up to `workers` at once. Ready lanes are served
+    round-robin, so a busy class cannot starve the others.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[object], Awaitable[None]],
+        workers: int = 4,
+        maxsize: int = 1000,
+        policy: str = POLICY_REJECT,
+        key: Optional[Callable[[object], Hashable]] = None,
+        sample_size: int = 1000,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self._process = process
+        self._workers = max(1, workers)
+        self._maxsize = max(1, maxsize)
+        self.policy = policy
+        self._key = key
+        self._lanes = {}  # key -> deque of (enqueued_at, update); present while ready or active
+        self._ready: Optional[asyncio.Queue] = None
+        self._size = 0
+        self._seq = 0
+        self._tasks = []
+
+        # Counters and recent samples (seconds) for sizing workers
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.max_depth = 0
+        self._wait_times = deque(maxlen=sample_size)
+        self._latencies = deque(maxlen=sample_size)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def depth(self) -> int:
+        return self._size
+
+    async def start(self) -> None:
+        """Create the ready queue on the running loop and spawn the workers."""
+        if self.running:
+            return
+        self._ready = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"update-worker-{i}")
+            for i in range(self._workers)
+        ]
+        logger.info(
+            f"Update queue started: {self._workers} workers, depth {self._maxsize}, policy {self.policy}"
+        )
+
+    async def stop(self, drain_timeout: float = 10.0) -> None:
+        """Give queued updates a chance to finish, then cancel the workers."""
+        if not self.running:
+            return
+        deadline = time.monotonic() + drain_timeout
+        while self._size and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._size:
+            logger.warning(f"Update queue stopped with {self._size} updates still pending")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Update queue stopped.")
+
+    def _lane_key(self, update: object) -> Hashable:
+        key = self._key(update) if self._key else None
+        if key is None:
+            # Unkeyed updates have no ordering constraint: give each its own lane
+            self._seq += 1
+            key = ("unkeyed", self._seq)
+        return key
+
+    def put(self, update: object) -> bool:
+        """Enqueue without waiting. Returns False when the queue is full."""
+        if self._size >= self._maxsize:
+            if self.policy == POLICY_DROP:
+                self.dropped += 1
+            else:
+                self.rejected += 1
+            return False
+        key = self._lane_key(update)
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = deque()
+            self._ready.put_nowait(key)
+        lane.append((time.monotonic(), update))
+        self._size += 1
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self._size)
+        return True
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            key = await self._ready.get()
+            lane = self._lanes[key]
+            enqueued_at, update = lane.popleft()
+            started = time.monotonic()
+            self._wait_times.append(started - enqueued_at)
+            UPDATE_QUEUE_WAIT.observe(started - enqueued_at)
+            try:
+                await self._process(update)
+                self.processed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.failed += 1
+                logger.exception(f"Update worker {index} failed to process update")
+            finally:
+                self._latencies.append(time.monotonic() - started)
+                self._size -= 1
+                # Hand the lane back only once this update is done, to keep the chat in order
+                if lane:
+                    self._ready.put_nowait(key)
+                else:
+                    del self._lanes[key]
+
+    def stats(self) -> dict:
+        """Snapshot of queue depth, wait time and processing latency (ms)."""
+        waits = list(self._wait_times)
+        latencies = list(self._latencies)
+        return {
+            "workers": self._workers,
+            "policy": self.policy,
+            "depth": self.depth(),
+            "max_depth": self.max_depth,
+            "capacity": self._maxsize,
+            "active_chats": len(self._lanes),
+            "largest_chat_backlog": max((len(lane) for lane in self._lanes.values()), default=0),
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "wait_ms": {
+                "p50": round(_percentile(waits, 50) * 1000, 2),
+                "p95": round(_percentile(waits, 95) * 1000, 2),
+                "max": round(max(waits, default=0.0) * 1000, 2),
+            },
+            "latency_ms": {
+                "p50": round(_percentile(latencies, 50) * 1000, 2),
+                "p95": round(_percentile(latencies, 95) * 1000, 2),
+                "max": round(max(latencies, default=0.0) * 1000, 2),
+            },
+        }
@@ -1,29 +1,29 @@
 import os
+import asyncio
 import logging
-import tempfile
 from typing import Optional
-from PIL import Image
-import pytesseract
-from pydub import AudioSegment
-import moviepy.editor as mp
 
-from telegram import Message, InputFile
+from telegram import (
+    Message,
+    InputMediaAudio,
+    InputMediaDocument,
+    InputMediaPhoto,
+    InputMediaVideo,
+)
 from telegram.ext import ContextTypes
 
+from keywords import scan_keywords
+from media.config import TESSDATA_PREFIX
+
 logger = logging.getLogger(__name__)
-TESSDATA_PREFIX = os.getenv("TESSDATA_PREFIX", "./tessdata")
-faster_whisper_model = None  # lazy-loaded model
 
-# --- OCR ---
-def extract_text_from_image(file_path: str) -> str:
-    """Run OCR on image file using pytesseract (supports Dzongkha if available)."""
-    try:
-        image = Image.open(file_path)
-        return pytesseract.image_to_string(image, lang="dzo+eng").strip()
-    except Exception as e:
-        logger.error(f"OCR failed: {e}")
-        return ""
+# --- Config ---
+def is_admin(user_id: int) -> bool:
+    """Check a user against ADMIN_CHAT_IDS from env."""
+    admin_ids = [i.strip() for i in os.getenv("ADMIN_CHAT_IDS", "").split(",")]
+    return str(user_id) in admin_ids
 
+# --- OCR ---
 async def setup_dzongkha_ocr():
     """Ensure Dzongkha language support is available (asynchronously)."""
     try:
@@ -40,85 +40,89 @@ async def setup_dzongkha_ocr():
     except Exception as e:
         logger.error(f"Failed to set up Dzongkha OCR: {e}")
 
-# --- Audio Transcription ---
-def lazy_load_faster_whisper():
-    global faster_whisper_model
-    if faster_whisper_model is None:
-        from faster_whisper import WhisperModel
-        faster_whisper_model = WhisperModel("tiny", compute_type="int8")
-    return faster_whisper_model
-
-def transcribe_audio(file_path: str) -> str:
-    """Convert audio file to text using faster-whisper (tiny model)."""
-    try:
-        model = lazy_load_faster_whisper()
-        segments, _ = model.transcribe(file_path)
-        return " ".join([seg.text.strip() for seg in segments if seg.text]).strip()
-    except Exception as e:
-        logger.error(f"Audio transcription failed: {e}")
-        return ""
-
-def convert_voice_to_wav(voice_bytes: bytes) -> str:
-    """Convert Telegram voice message bytes (OGG/MP3) to WAV for transcription."""
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as out_file:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".ogg") as tmp_ogg:
-                tmp_ogg.write(voice_bytes)
-                tmp_ogg.flush()
-                audio = AudioSegment.from_file(tmp_ogg.name)
-                audio.export(out_file.name, format="wav")
-            return out_file.name
-    except Exception as e:
-        logger.error(f"Failed to convert voice to WAV: {e}")
-        return ""
-
-def convert_video_to_wav(video_path: str) -> str:
-    """Extract audio from video as WAV."""
-    try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as wav_file:
-            video = mp.VideoFileClip(video_path)
-            video.audio.write_audiofile(wav_file.name, codec='pcm_s16le')
-            return wav_file.name
-    except Exception as e:
-        logger.error(f"Failed to extract audio from video: {e}")
-        return ""
-
 # --- Message Filtering ---
-def is_junk_message(text: Optional[str]) -> bool:
+def is_junk_message(text: Optional[str], chat_id: Optional[int] = None) -> bool:
     """Detect junk/bot promotion messages."""
-    if not text:
-        return False
-    junk_keywords = ["/nayavpn", "promo", "cheap price", "@", "join fast", "discount"]
-    return any(junk in text.lower() for junk in junk_keywords)
+    return scan_keywords(text, chat_id)["junk"] > 0
 
-def is_homework_text(text: str) -> bool:
+def is_homework_text(text: str, chat_id: Optional[int] = None) -> bool:
     """Keyword-based heuristic to determine if message is homework-related."""
-    keywords = ["homework", "classwork", "assignment", "exercise", "page", "question", "write", "draw"]
-    return any(word in text.lower() for word in keywords)
+    return scan_keywords(text, chat_id)["homework"] > 0
 
 # --- Forwarding ---
-async def forward_message_to_parent_group(
+def _send(context: ContextTypes.DEFAULT_TYPE, target_chat_id: int, func, **kwargs):
+    """Queue a send on the rate-limited scheduler, or call the Bot API directly without one."""
+    scheduler = context.bot_data.get("SEND_SCHEDULER")
+    if scheduler is None:
+        return asyncio.ensure_future(func(**kwargs))
+    return scheduler.submit(target_chat_id, func, **kwargs)
+
+def _log_send_failure(future: asyncio.Future) -> None:
+    if not future.cancelled() and future.exception():
+        logger.error(f"Failed to forward message: {future.exception()}")
+
+def _input_media(message: Message):
+    """Album item as InputMedia, for Bot API servers without copyMessages."""
+    caption = {"caption": message.caption, "caption_entities": message.caption_entities}
+    if message.photo:
+        return InputMediaPhoto(media=message.photo[-1].file_id, **caption)
+    if message.video:
+        return InputMediaVideo(media=message.video.file_id, **caption)
+    if message.audio:
+        return InputMediaAudio(media=message.audio.file_id, **caption)
+    return InputMediaDocument(media=message.document.file_id, **caption)
+
+def _send_album(context: ContextTypes.DEFAULT_TYPE, target_chat_id: int, messages: list) -> asyncio.Future:
+    """Send a whole media group in one API call."""
+    bot = context.bot
+    messages = sorted(messages, key=lambda m: m.message_id)
+    if len(messages) == 1:  # media groups need at least two items
+        future = _send(
+            context, target_chat_id, bot.copy_message,
+            chat_id=target_chat_id,
+            from_chat_id=messages[0].chat_id,
+            message_id=messages[0].message_id,
+        )
+    elif hasattr(bot, "copy_messages"):  # Bot API 7.0+ (python-telegram-bot >= 20.8)
+        future = _send(
+            context, target_chat_id, bot.copy_messages,
+            chat_id=target_chat_id,
+            from_chat_id=messages[0].chat_id,
+            message_ids=[m.message_id for m in messages],
+        )
+    else:
+        future = _send(
+            context, target_chat_id, bot.send_media_group,
+            chat_id=target_chat_id,
+            media=[_input_media(m) for m in messages],
+        )
+    future.add_done_callback(_log_send_failure)
+    return future
+
+def forward_message_to_parent_group(
     context: ContextTypes.DEFAULT_TYPE,
     message: Message,
     target_chat_id: int,
-) -> None:
-    """Forward or copy supported message types from student to parent group."""
-    try:
-        if message.text:
-            await context.bot.send_message(chat_id=target_chat_id, text=message.text)
-        elif message.photo:
-            file_id = message.photo[-1].file_id
-            caption = message.caption or ""
-            await context.bot.send_photo(chat_id=target_chat_id, photo=file_id, caption=caption)
-        elif message.document:
-            await context.bot.send_document(chat_id=target_chat_id, document=message.document.file_id, caption=message.caption or "")
-        elif message.audio:
-            await context.bot.send_audio(chat_id=target_chat_id, audio=message.audio.file_id, caption=message.caption or "")
-        elif message.voice:
-            await context.bot.send_voice(chat_id=target_chat_id, voice=message.voice.file_id, caption=message.caption or "")
-        elif message.video:
-            await context.bot.send_video(chat_id=target_chat_id, video=message.video.file_id, caption=message.caption or "")
-        else:
-            await context.bot.send_message(chat_id=target_chat_id, text="[Unsupported message type]")
-    except Exception as e:
-        logger.error(f"Failed to forward message: {e}")
+) -> asyncio.Future:
+    """Copy a message of any type from student to parent group.
+
+    Album items are collected and sent as one media group. Sends are queued
+    per target (in order, within flood limits); await the returned future to
+    wait for delivery.
+    """
+    collector = context.bot_data.get("MEDIA_GROUPS")
+    if message.media_group_id and collector is not None:
+        key = (message.chat_id, message.media_group_id, target_chat_id)
+        return collector.add(key, message, lambda messages: _send_album(context, target_chat_id, messages))
+
+    if collector is not None:
+        # An album still being collected from this chat has to go out first
+        collector.flush(message.chat_id, target_chat_id)
+    future = _send(
+        context, target_chat_id, context.bot.copy_message,
+        chat_id=target_chat_id,
+        from_chat_id=message.chat_id,
+        message_id=message.message_id,
+    )
+    future.add_done_callback(_log_send_failure)
+    return future
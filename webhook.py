@@ -0,0 +1,62 @@
+"""Webhook ingestion fast path: secret-token check, JSON decoding and update-type filtering.
+
+Runs before Update.de_json. A request without the right
+X-Telegram-Bot-Api-Secret-Token is rejected before its body is read,
+and update types no handler uses are acknowledged without building an
+Update.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import os
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib decoder is the fallback
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Sent back by Telegram in X-Telegram-Bot-Api-Secret-Token; set_webhook.py registers it.
+# Empty disables the check (any POST to the webhook is accepted).
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+# Update types the handlers use: MessageHandler(filters.ALL) and the commands.
+# Registered as allowed_updates, so Telegram doesn't send anything else.
+ALLOWED_UPDATES = ["message", "edited_message", "channel_post", "edited_channel_post"]
+# "auto": orjson when installed, else json; or force "orjson" / "json"
+JSON_DECODER = os.getenv("JSON_DECODER", "auto").lower()
+
+_secret = WEBHOOK_SECRET.encode("utf-8")
+_allowed = frozenset(ALLOWED_UPDATES)
+
+
+def secret_path(token: str) -> str:
+    """The unguessable webhook path set_webhook.py registers: sha256 of the bot token."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def decoder_name(decoder: Optional[str] = None) -> str:
+    decoder = decoder or JSON_DECODER
+    if decoder == "auto":
+        return "orjson" if orjson is not None else "json"
+    return decoder
+
+
+if decoder_name() == "orjson" and orjson is None:
+    logger.warning("JSON_DECODER=orjson but orjson is not installed, using json")
+loads = orjson.loads if decoder_name() == "orjson" and orjson is not None else json.loads
+
+
+def authorized(headers) -> bool:
+    """Constant-time comparison of the secret-token header (always True without WEBHOOK_SECRET)."""
+    if not _secret:
+        return True
+    return hmac.compare_digest(headers.get(SECRET_HEADER, "").encode("utf-8"), _secret)
+
+
+def wanted(data) -> bool:
+    """Whether the decoded update carries a type some handler uses."""
+    return isinstance(data, dict) and not _allowed.isdisjoint(data)